@@ -1,35 +1,33 @@
-import yfinance as yf
 import pandas as pd
-from email_sender import send_email
+from email_sender import flush_emails, send_email
+from instrumentation import api_call, profiling, stage, timed, write_profile
+from scheduler import request
+from signals import evaluate_report
+from fundamentals import cached_pe_ratio, refresh_fundamentals
+from bar_store import as_of_date, as_of_now, fetch_yfinance_bars, load_arrays, update_bars
+from trade_journal import TradeJournal, import_legacy_log
+from universe import advance_states, load_universe, prescreen
+from indicators import (
+    IndicatorState, can_resume, load_indicator_states, rsi_matrix, save_indicator_states, srsi_matrix, update_from_bars
+)
 from dotenv import load_dotenv
 import numpy as np
-from datetime import datetime
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 RSI_STATE_FILE = "rsi_state.json"
 RSI_BUY_FILE = "rsi_buy_signals.json"
+ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", "8"))
 
 load_dotenv()
 
 
 def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-
-    avg_gain = gain.ewm(alpha=1/window, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1/window, adjust=False).mean()
-
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+    return pd.Series(rsi_matrix(series.to_numpy(dtype='float64'), window)[0], index=series.index)
 
 def compute_srsi(rsi, window=14):
-    min_rsi = rsi.rolling(window).min()
-    max_rsi = rsi.rolling(window).max()
-    range_rsi = max_rsi - min_rsi
-    srsi = (rsi - min_rsi) / range_rsi.replace(0, pd.NA)
-    return srsi * 100
+    return pd.Series(srsi_matrix(rsi.to_numpy(dtype='float64'), window)[0], index=rsi.index)
 
 def analyze_entry(rsi, srsi, price_vs_ma20, price_vs_ma50, pe_ratio, html_format=False):
     notes = []
@@ -72,80 +70,57 @@ def analyze_exit(rsi, price_vs_ma20, price_vs_ma50, previous_rsi=None):
         return "🔻 Sell — Price above MA50"
     return None
     
-def log_trade_opportunity(data, filename="trade_log.csv"):
-    log_cols = [
-        'Date', 'Ticker', 'Price', 'RSI', 'SRSI',
-        'MA20', 'MA50',
-        'Price_vs_MA20(%)', 'Price_vs_MA50(%)',
-        'PE_Ratio', 'Recommendation', 'Target1', 'Target2', 'StopLoss'
-    ]
-
-    entry = {
-        **data,
-        'Target1': round(data['MA20'], 2),
-        'Target2': round(data['MA50'], 2),
-        'StopLoss': round(data['Price'] * 0.975, 2)
-    }
+def update_bar_store(tickers):
+    end_date = as_of_date().strftime('%Y-%m-%d')
+    return update_bars(tickers, fetch_yfinance_bars, 'yfinance', end_date=end_date)
 
-    df = pd.DataFrame([entry], columns=log_cols)
+def stored_closes(ticker, start=None):
+    end_date = as_of_date().strftime('%Y-%m-%d')
 
-    if os.path.exists(filename):
-        df.to_csv(filename, mode='a', index=False, header=False)
-    else:
-        df.to_csv(filename, mode='w', index=False, header=True)
+    dates, arrays = load_arrays(ticker, 'yfinance', start=start, columns=['Close'])
+    if dates is None:
+        update_bar_store([ticker])
+        dates, arrays = load_arrays(ticker, 'yfinance', start=start, columns=['Close'])
+    if dates is None or not len(dates):
+        raise ValueError(f"no bars stored for {ticker}")
 
+    # yfinance's end date is exclusive, keep today's partial bar out as before
+    closes = pd.Series(arrays['Close'], index=pd.DatetimeIndex(dates, name='datetime'))
+    return closes[closes.index < pd.Timestamp(end_date)].dropna()
 
+def ticker_metrics(ticker, indicator_state=None, fundamentals=None):
+    if indicator_state is None:
+        indicator_state = IndicatorState()
 
-def analyze_ticker(ticker):
-    start_date = (pd.Timestamp.today() - pd.Timedelta(days=90)).strftime('%Y-%m-%d')
-    end_date = pd.Timestamp.today().strftime('%Y-%m-%d')
+    # Only bars since the last update are read unless the state must be rebuilt
+    closes = stored_closes(ticker, start=indicator_state.last_date)
+    if not can_resume(indicator_state, closes):
+        indicator_state.reset()
+        closes = stored_closes(ticker)
+    update_from_bars(indicator_state, closes)
 
-    df = yf.download(ticker, start=start_date, end=end_date, auto_adjust=True)[['Close']].copy()
-    df.dropna(inplace=True)
-    df.reset_index(inplace=True)
-    df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
-    df['Date'] = pd.to_datetime(df['Date'])
+    latest = indicator_state.snapshot()
+    if any(pd.isna(latest[col]) for col in ['RSI', 'SRSI', 'MA20', 'MA50']):
+        raise ValueError(f"not enough history for {ticker}")
 
-    df['RSI'] = compute_rsi(df['Close'])
-    df['SRSI'] = compute_srsi(df['RSI'])
-    df['MA20'] = df['Close'].rolling(window=20).mean()
-    df['MA50'] = df['Close'].rolling(window=50).mean()
-    df.dropna(subset=['RSI', 'SRSI', 'MA20', 'MA50'], inplace=True)
+    if fundamentals is None:
+        fundamentals = refresh_fundamentals([ticker])
+    pe = cached_pe_ratio(fundamentals, ticker)
 
-    latest = df.iloc[-1]
+    import yfinance as yf
 
-    try:
-        info = yf.Ticker(ticker).info
-        pe_ratio = info.get('trailingPE', None)
-    except Exception:
-        pe_ratio = None
+    def last_price():
+        with api_call('yfinance.fast_info'):
+            return yf.Ticker(ticker).fast_info['last_price']
 
     try:
-        current_price = yf.Ticker(ticker).fast_info['last_price']
+        current_price = request('yfinance', last_price, key=('yfinance.fast_info', ticker))
     except Exception:
         current_price = latest['Close']  
 
-    recommendation = analyze_entry(
-        latest['RSI'],
-        latest['SRSI'],
-        (current_price - latest['MA20']) / latest['MA20'] * 100,
-        (current_price - latest['MA50']) / latest['MA50'] * 100,
-        pe_ratio,
-        html_format=True
-    )
-
-    previous_rsi = active_positions.get(ticker, None)
-
-    exit_signal = analyze_exit(
-        latest['RSI'],
-        (current_price - latest['MA20']) / latest['MA20'] * 100,
-        (current_price - latest['MA50']) / latest['MA50'] * 100,
-        previous_rsi
-    )
-
     return {
         'Ticker': ticker,
-        'Date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+        'Date': as_of_now().strftime("%Y-%m-%d %H:%M"),
         'Price': current_price,
         'RSI': latest['RSI'],
         'SRSI': latest['SRSI'],
@@ -153,12 +128,52 @@ def analyze_ticker(ticker):
         'MA50': latest['MA50'],
         'Price_vs_MA20(%)': (current_price - latest['MA20']) / latest['MA20'] * 100,
         'Price_vs_MA50(%)': (current_price - latest['MA50']) / latest['MA50'] * 100,
-        'PE_Ratio': pe_ratio,
-        'Recommendation': recommendation,
-        'Sell_Signal': exit_signal
-
+        'PE_Ratio': pe,
     }
 
+def analyze_ticker(ticker, indicator_state=None, fundamentals=None, active_positions=None):
+    result = ticker_metrics(ticker, indicator_state, fundamentals)
+
+    result['Recommendation'] = analyze_entry(
+        result['RSI'],
+        result['SRSI'],
+        result['Price_vs_MA20(%)'],
+        result['Price_vs_MA50(%)'],
+        result['PE_Ratio'],
+        html_format=True
+    )
+
+    previous_rsi = (active_positions or {}).get(ticker, None)
+
+    result['Sell_Signal'] = analyze_exit(
+        result['RSI'],
+        result['Price_vs_MA20(%)'],
+        result['Price_vs_MA50(%)'],
+        previous_rsi
+    )
+    return result
+
+# Runs ticker_metrics for all tickers on a bounded thread pool.  A failing
+# ticker is reported and skipped; results keep the order of `tickers`.
+def analyze_tickers(tickers, indicator_states, fundamentals, workers=ANALYZE_WORKERS):
+    for ticker in tickers:
+        indicator_states.setdefault(ticker, IndicatorState())
+
+    def analyze_one(ticker):
+        try:
+            with stage('ticker_metrics', ticker):
+                return ticker_metrics(ticker, indicator_states[ticker], fundamentals)
+        except Exception as e:
+            print(f"❌ Error analyzing {ticker}: {e}")
+            return None
+
+    if workers <= 1:
+        metrics = [analyze_one(ticker) for ticker in tickers]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            metrics = list(pool.map(analyze_one, tickers))
+    return [m for m in metrics if m]
+
 def get_open_tickers(filename="positions.csv"):
     if not os.path.exists(filename):
         return []
@@ -171,22 +186,17 @@ def get_open_tickers(filename="positions.csv"):
 
 # === Run analysis on desired tickers ===
 
-if __name__ == "__main__":
-    tickers = [
-        'AAPL', 'MSFT', 'NVDA', 'AMD', 'GOOGL', 'META',
-        'JPM', 'GS', 'BAC', 'JNJ', 'PFE', 'UNH', 'LLY',
-        'AMZN', 'DIS', 'HD', 'COST', 'DE', 'GE', 'XOM', 'CVX',
-        'DAL', 'EXPE', 'SPY', 'QQQ', 'XLK', 'XLF', 'SHOP', 'NET', 'ZS', 'SCHW', 'PYPL',
-        'MRK', 'BMY', 'ABBV', 'TMO', 'IBB',
-        'TGT', 'WMT', 'ULTA', 'MCD',
-        'NOC', 'RTX', 'LMT', 'FCX',
-        'IWM', 'XLV', 'XLE', 'ARKK',
-        #'SQ'
-    ]
+def main():
+    with profiling():
+        run_report()
+    write_profile('analyze')
+
+
+def run_report():
+    tickers = load_universe()
     watchlist = get_open_tickers()
     already_in_positions = set(watchlist)
 
-    results = []
     buy_opportunities = []
 
     if os.path.exists(RSI_STATE_FILE):
@@ -204,38 +214,60 @@ if __name__ == "__main__":
     active_positions = {k: float(v) for k, v in active_positions.items()}
     rsi_at_buy = {k: float(v) for k, v in rsi_at_buy.items()}
 
-
+    # Stage one: one batched daily-bar download for the whole universe, then
+    # only tickers that could still meet the entry rule (or that are held or
+    # flagged) go on to the per-ticker price and P/E lookups
+    with stage('update_bar_store'):
+        update_bar_store(tickers)
+    indicator_states = load_indicator_states()
+    with stage('prescreen'):
+        advance_states(tickers, indicator_states, 'yfinance', as_of_date())
+        tickers, _ = prescreen(tickers, indicator_states, as_of_date(), keep=already_in_positions | set(active_positions))
 
     TAKE_PROFIT_PCT = 0.20
     STOP_LOSS_PCT = 0.20
 
-    for ticker in tickers:
-        try:
-            result = analyze_ticker(ticker)
-
-            if not result:
-                continue
-            
-            results.append(result)
+    # P/E lookups are the slowest endpoint; the survivors' stale ones are
+    # refreshed in the background while their prices are looked up, and
+    # P/E is filled in once both are done
+    with ThreadPoolExecutor(max_workers=1) as background:
+        fundamentals_refresh = background.submit(timed('refresh_fundamentals')(refresh_fundamentals), tickers)
+        with stage('analyze_tickers'):
+            results = analyze_tickers(tickers, indicator_states, {})
+        with stage('fundamentals_wait'):
+            fundamentals = fundamentals_refresh.result()
+    for result in results:
+        result['PE_Ratio'] = cached_pe_ratio(fundamentals, result['Ticker'])
+
+    # Opportunities are buffered and written to the journal in one batch
+    import_legacy_log()
+    journal = TradeJournal()
+
+    # Entry and exit rules for every ticker in one vectorized pass
+    if results:
+        report = evaluate_report(pd.DataFrame(results).set_index('Ticker'), active_positions)
+        for result in results:
+            result.update(report.loc[result['Ticker']].to_dict())
 
-            if ticker in already_in_positions:
-                continue 
+    for result in results:
+        ticker = result['Ticker']
+        if ticker in already_in_positions:
+            continue
 
-            if result['Recommendation'].startswith("🔥") or result['Recommendation'].startswith("✅"):
-                trade_result = result.copy()
-                trade_result['Target1'] = round(result['Price'] * (1 + TAKE_PROFIT_PCT), 2)
-                trade_result['StopLoss'] = round(result['Price'] * (1 - STOP_LOSS_PCT), 2)
+        if result['Recommendation'].startswith("🔥") or result['Recommendation'].startswith("✅"):
+            trade_result = result.copy()
+            trade_result['Target1'] = round(result['Price'] * (1 + TAKE_PROFIT_PCT), 2)
+            trade_result['StopLoss'] = round(result['Price'] * (1 - STOP_LOSS_PCT), 2)
 
 
-                buy_opportunities.append(trade_result) 
-                log_trade_opportunity(trade_result)    
-                active_positions[ticker] = result['RSI']
-                if ticker not in rsi_at_buy:
-                    rsi_at_buy[ticker] = result['RSI']
+            buy_opportunities.append(trade_result) 
+            journal.log(trade_result)
+            active_positions[ticker] = result['RSI']
+            if ticker not in rsi_at_buy:
+                rsi_at_buy[ticker] = result['RSI']
 
-
-        except Exception as e:
-            print(f"❌ Error analyzing {ticker}: {e}")
+    save_indicator_states(indicator_states)
+    journal.flush()
 
     with open(RSI_STATE_FILE, 'w') as f:
         json.dump(active_positions, f, indent=2)
@@ -261,7 +293,7 @@ if __name__ == "__main__":
             for r in results
         ])
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        timestamp = as_of_now().strftime("%Y-%m-%d %H:%M")
 
         if buy_opportunities:
             trades_df = pd.DataFrame(buy_opportunities)
@@ -297,12 +329,18 @@ if __name__ == "__main__":
         </body>
         </html>
         """
-        send_email(
-            subject = f"📊 Daily Stock Report — {timestamp}",
-            body=html_body,
-            recipient_email=os.environ["EMAIL_RECIPIENT"],
-            is_html=True
-        )
-        print("✅ Email sent.")
+        with stage('send_email'):
+            send_email(
+                subject = f"📊 Daily Stock Report — {timestamp}",
+                body=html_body,
+                recipient_email=os.environ["EMAIL_RECIPIENT"],
+                is_html=True
+            )
+            failed = flush_emails()
+        print("✅ Email sent." if not failed else "❌ Email could not be sent.")
     else:
         print("❌ No analysis results to send.")
+
+
+if __name__ == "__main__":
+    main()
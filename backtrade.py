@@ -1,10 +1,17 @@
 import backtrader as bt
-import yfinance as yf
 import pandas as pd
+import argparse
+import json
+import math
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from bar_store import fetch_yfinance_bars, load_bars, update_bars
+from vector_backtest import run_backtest, sweep, walk_forward
+from universe import load_universe
 
-data_dir = "cached_data"
-os.makedirs(data_dir, exist_ok=True)
+BACKTEST_START = '2025-01-01'
+BACKTEST_END = '2025-06-24'
 
 class FixedQtySizer(bt.Sizer):
     params = (('qty', 1),)
@@ -26,7 +33,11 @@ class StochasticRSI(bt.Indicator):
 
 
 class RSISRSIStrategy(bt.Strategy):
-    params = dict(rsi_jump_threshold=42, price_ma20_threshold=12, price_ma50_threshold=10)
+    params = dict(
+        rsi_jump_threshold=42, price_ma20_threshold=12, price_ma50_threshold=10,
+        rsi_entry_threshold=30, srsi_entry_threshold=30, rsi_overbought=70,
+        take_profit_pct=0.20, stop_loss_pct=0.20,
+    )
 
     def __init__(self):
         self.rsi = bt.indicators.RSI(self.data.close, period=14)
@@ -47,7 +58,11 @@ class RSISRSIStrategy(bt.Strategy):
             return
 
         if not self.position:
-            if self.rsi[0] < 30 and self.srsi[0] < 30 and self.data.close[0] < self.ma20[0]:
+            if (
+                self.rsi[0] < self.p.rsi_entry_threshold and
+                self.srsi[0] < self.p.srsi_entry_threshold and
+                self.data.close[0] < self.ma20[0]
+            ):
                 self.buy_price = self.data.close[0]
                 self.buy_rsi = self.rsi[0]
                 self.bar_executed = len(self)
@@ -65,8 +80,8 @@ class RSISRSIStrategy(bt.Strategy):
             price_vs_ma20 = (price - self.ma20[0]) / self.ma20[0] * 100
             price_vs_ma50 = (price - self.ma50[0]) / self.ma50[0] * 100
 
-            stop_loss_pct = 0.20
-            take_profit_pct = 0.20
+            stop_loss_pct = self.p.stop_loss_pct
+            take_profit_pct = self.p.take_profit_pct
 
             take_profit_price = self.buy_price * (1 + take_profit_pct)
             stop_loss_price = self.buy_price * (1 - stop_loss_pct)
@@ -84,7 +99,7 @@ class RSISRSIStrategy(bt.Strategy):
                 self.srsi_extreme_bars = 0 
 
             sell_signal = (
-                self.rsi[0] > 70 or
+                self.rsi[0] > self.p.rsi_overbought or
                 rsi_jump > self.p.rsi_jump_threshold or
                 price_vs_ma20 > self.p.price_ma20_threshold or
                 price_vs_ma50 > self.p.price_ma50_threshold
@@ -97,7 +112,7 @@ class RSISRSIStrategy(bt.Strategy):
             elif take_profit_triggered:
                 sell_price = take_profit_price
                 exit_reason = "Take Profit"
-            elif self.rsi[0] > 70:
+            elif self.rsi[0] > self.p.rsi_overbought:
                 exit_reason = "RSI Overbought"
             elif rsi_jump > self.p.rsi_jump_threshold:
                 exit_reason = "RSI Jump"
@@ -146,87 +161,193 @@ class RSISRSIStrategy(bt.Strategy):
       
 
 
-if __name__ == '__main__':
-    tickers = [
-        'AAPL', 'MSFT', 'NVDA', 'AMD', 'GOOGL', 'META',
-        'JPM', 'GS', 'BAC', 'JNJ', 'PFE', 'UNH', 'LLY',
-        'AMZN', 'DIS', 'HD', 'COST', 'DE', 'GE', 'XOM', 'CVX',
-        'DAL', 'EXPE', 'SPY', 'QQQ', 'XLK', 'XLF', 'SHOP', 'NET', 'ZS', 'SCHW', 'PYPL',
-        'MRK', 'BMY', 'ABBV', 'TMO', 'IBB',
-        'TGT', 'WMT', 'ULTA', 'MCD',
-        'NOC', 'RTX', 'LMT', 'FCX',
-        'IWM', 'XLV', 'XLE', 'ARKK',
-        #'SQ'
-    ]
-    #tickers = ['BTC-USD', 'ETH-USD', 'XRP-USD']
-
-
-    finalPnL = 0
-    all_trades = []
-    open_positions = []
+def load_backtest_bars(tickers, start=BACKTEST_START, end=BACKTEST_END):
+    # yfinance's end date is exclusive, load_bars' is inclusive
+    update_bars(tickers, fetch_yfinance_bars, 'yfinance', start_date=start, end_date=end, load=False)
 
+    window_bars = {}
     for ticker in tickers:
-        filename = os.path.join(data_dir, f"{ticker}.csv")
+        df = load_bars(ticker, 'yfinance', start=start, end=pd.Timestamp(end) - pd.Timedelta(days=1))
+        if df is not None:
+            df = df.dropna()
 
-        if os.path.exists(filename):
-            df = pd.read_csv(filename, index_col=0, parse_dates=True)
-            print(f"✅ Loaded cached data for {ticker}")
-        else:
-            df = yf.download(ticker, start='2025-01-01', end='2025-06-24', auto_adjust=True)
-            if df.empty:
-                print(f"⚠️ No data for {ticker}, skipping.")
-                continue
+        if df is None or df.empty:
+            print(f"⚠️ No data for {ticker}, skipping.")
+            continue
+        window_bars[ticker] = df
+    return window_bars
 
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
 
-            df.index.name = 'datetime'
-            df.to_csv(filename)
-            print(f"⬇️ Downloaded and cached data for {ticker}")
+# Walk-forward chunk loader: reads [start, end) of each ticker from the bar store
+def load_store_chunk(tickers, start, end):
+    chunk = {}
+    for ticker in tickers:
+        df = load_bars(ticker, 'yfinance', start=start, end=pd.Timestamp(end) - pd.Timedelta(days=1))
+        if df is not None:
+            chunk[ticker] = df
+    return chunk
+
+
+def run_cerebro(ticker, df, params=None):
+    data = bt.feeds.PandasData(dataname=df, name=ticker)
+
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(RSISRSIStrategy, **(params or {}))
+    cerebro.adddata(data)
+    cerebro.addsizer(FixedQtySizer, qty=1)
+    cerebro.broker.set_coc(True)
+    cerebro.broker.set_cash(10000)
+    
+    strategies = cerebro.run()
+    strategy = strategies[0]
+
+    trades_df = getattr(strategy, 'trades_df', None)
+    open_position = None
+
+    position = cerebro.broker.getposition(data)
+    if position.size > 0:
+        buy_info = strategy.buy_infos.get(ticker, {})
+        open_position = {
+            'Ticker': ticker,
+            'Size': position.size,
+            'Price': position.price,
+            'Value': position.size * position.price,
+            'Buy Date': buy_info.get('Buy Date'),
+            'Buy Price': buy_info.get('Buy Price')
+        }
+    return trades_df, open_position
+
+
+def _run_cerebro_item(item):
+    return run_cerebro(*item)
+
+# Tickers are independent (own cash, own strategy), so each Cerebro run can go
+# to a separate process.  Results come back in the order of `bars_by_ticker`.
+def run_cerebro_backtests(bars_by_ticker, workers=None):
+    items = list(bars_by_ticker.items())
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(items) <= 1:
+        return [run_cerebro(ticker, df) for ticker, df in items]
+
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_cerebro_item, items, chunksize=chunksize))
+
+
+def _same(a, b, tolerance):
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is None and b is None
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return math.isclose(a, b, rel_tol=tolerance, abs_tol=tolerance)
+    return a == b
+
+# Runs every ticker through Cerebro and through the vectorized engine and
+# returns a description of each trade or open position that differs.
+def compare_with_backtrader(bars_by_ticker, tolerance=1e-6, workers=None):
+    vector_trades, vector_open = run_backtest(bars_by_ticker)
+    vector_open = {pos['Ticker']: pos for pos in vector_open}
+    cerebro_results = run_cerebro_backtests(bars_by_ticker, workers)
+
+    mismatches = []
+    for ticker, (trades_df, open_position) in zip(bars_by_ticker, cerebro_results):
+        expected = [] if trades_df is None else trades_df.to_dict('records')
+        actual = vector_trades[vector_trades['Ticker'] == ticker].to_dict('records')
+
+        if len(expected) != len(actual):
+            mismatches.append(f"{ticker}: {len(expected)} backtrader trades vs {len(actual)} vectorized")
+        for i, (want, got) in enumerate(zip(expected, actual)):
+            for key, value in want.items():
+                if not _same(value, got[key], tolerance):
+                    mismatches.append(f"{ticker} trade {i} {key}: {value} vs {got[key]}")
+
+        got_open = vector_open.get(ticker)
+        if (open_position is None) != (got_open is None):
+            mismatches.append(f"{ticker}: open position {open_position} vs {got_open}")
+        elif open_position is not None:
+            for key, value in open_position.items():
+                if not _same(value, got_open[key], tolerance):
+                    mismatches.append(f"{ticker} open position {key}: {value} vs {got_open[key]}")
+    return mismatches
 
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)  # Flatten column names
 
-        for col in ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backtest RSISRSIStrategy")
+    parser.add_argument('--vectorized', action='store_true', help="use the array-based engine instead of Cerebro")
+    parser.add_argument('--parity', action='store_true', help="compare the vectorized engine against Cerebro and exit")
+    parser.add_argument('--sweep', nargs='?', const='', metavar='GRID_JSON',
+                        help="rank parameter sets from a JSON grid {param: [values]} (default grid if omitted)")
+    parser.add_argument('--walk-forward', action='store_true',
+                        help="rolling train/test walk-forward, streaming bars from the store chunk by chunk")
+    parser.add_argument('--train-months', type=int, default=12, help="walk-forward training window")
+    parser.add_argument('--test-months', type=int, default=3, help="walk-forward test window (and chunk size)")
+    parser.add_argument('--start', default=BACKTEST_START, help="first day of the backtest")
+    parser.add_argument('--end', default=BACKTEST_END, help="day after the last day of the backtest")
+    parser.add_argument('--workers', type=int, default=None, help="processes for Cerebro runs (default: all cores)")
+    parser.add_argument('--universe', default=None, help="symbol files or universe names (default: $UNIVERSE)")
+    args = parser.parse_args()
+
+    tickers = load_universe(args.universe)
+    #tickers = ['BTC-USD', 'ETH-USD', 'XRP-USD']
 
-        df.dropna(inplace=True)
 
-        if df.empty:
-            print(f"⚠️ No data for {ticker}, skipping.")
-            continue
+    finalPnL = 0
+    all_trades = []
+    open_positions = []
 
-        data = bt.feeds.PandasData(dataname=df, name=ticker)
-
-        cerebro = bt.Cerebro()
-        cerebro.addstrategy(RSISRSIStrategy)
-        cerebro.adddata(data)
-        cerebro.addsizer(FixedQtySizer, qty=1)
-        cerebro.broker.set_coc(True)
-        cerebro.broker.set_cash(10000)
-        
-        strategies = cerebro.run()
-        strategy = strategies[0]
-
-        if hasattr(strategy, 'trades_df'):
-            all_trades.append(strategy.trades_df)
-            dollar_pnl = strategy.trades_df['Dollar_PnL'].sum()
-            finalPnL += dollar_pnl
-
-        position = cerebro.broker.getposition(data)
-        if position.size > 0:
-            buy_info = strategy.buy_infos.get(ticker, {})
-            open_positions.append({
-                'Ticker': ticker,
-                'Size': position.size,
-                'Price': position.price,
-                'Value': position.size * position.price,
-                'Buy Date': buy_info.get('Buy Date'),
-                'Buy Price': buy_info.get('Buy Price')
-            })
-
-        
+    if args.walk_forward:
+        grid = None
+        if args.sweep:
+            with open(args.sweep, 'r') as f:
+                grid = json.load(f)
+        update_bars(tickers, fetch_yfinance_bars, 'yfinance', start_date=args.start, end_date=args.end, load=False)
+        windows, open_positions = walk_forward(
+            tickers, load_store_chunk, args.start, args.end,
+            train_months=args.train_months, test_months=args.test_months, grid=grid, workers=args.workers
+        )
+        total = windows['PnL'].sum() if not windows.empty else 0.0
+        print(f"\n💰 Walk-forward PnL over {len(windows)} windows: {total:.2f}")
+        for pos in open_positions:
+            print(f"{pos['Ticker']} | Entry: {pos['Buy Date']} at ${pos['Buy Price']:.2f} | Current: ${pos['Price']:.2f}")
+        sys.exit(0)
+
+    bars_by_ticker = load_backtest_bars(tickers, args.start, args.end)
+
+    if args.parity:
+        mismatches = compare_with_backtrader(bars_by_ticker, workers=args.workers)
+        for mismatch in mismatches:
+            print(f"❌ {mismatch}")
+        if not mismatches:
+            print(f"✅ Vectorized engine matches backtrader on {len(bars_by_ticker)} tickers")
+        sys.exit(1 if mismatches else 0)
+
+    if args.sweep is not None:
+        grid = None
+        if args.sweep:
+            with open(args.sweep, 'r') as f:
+                grid = json.load(f)
+        results = sweep(bars_by_ticker, grid, workers=args.workers)
+        results.to_csv("sweep_results.csv", index=False)
+        print(f"\n🏁 Top parameter sets of {len(results)}:")
+        print(results.head(10).to_string(index=False))
+        sys.exit(0)
+
+    if args.vectorized:
+        trades_df, open_positions = run_backtest(bars_by_ticker)
+        if not trades_df.empty:
+            all_trades.append(trades_df)
+            finalPnL += trades_df['Dollar_PnL'].sum()
+    else:
+        for trades_df, open_position in run_cerebro_backtests(bars_by_ticker, args.workers):
+
+            if trades_df is not None:
+                all_trades.append(trades_df)
+                dollar_pnl = trades_df['Dollar_PnL'].sum()
+                finalPnL += dollar_pnl
+
+            if open_position is not None:
+                open_positions.append(open_position)
 
     print(f"\n💰 Final Total PnL across all tickers: {finalPnL:.2f}")
 
@@ -0,0 +1,364 @@
+import pandas as pd
+import numpy as np
+import pyarrow.feather as feather
+import os
+import ast
+import json
+import logging
+import threading
+from instrumentation import api_call
+from scheduler import request
+
+BAR_STORE_DIR = os.environ.get("BAR_STORE_DIR", "bar_data")
+MANIFEST_FILE = "manifest.json"
+DEFAULT_START_DATE = "2025-01-01"
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+YFINANCE_CHUNK_SIZE = int(os.environ.get("YFINANCE_CHUNK_SIZE", "50"))
+
+# Relative change of the overlapping bar that means history was revised
+# (e.g. a dividend re-adjusting yfinance's auto_adjust closes)
+REVISION_TOLERANCE = 1e-6
+
+# Serializes manifest read-modify-write cycles between threads
+_update_lock = threading.Lock()
+
+
+# The trading day a run acts as of: today, or AS_OF_DATE (YYYY-MM-DD) when
+# replaying a past day
+def as_of_date():
+    as_of = os.environ.get("AS_OF_DATE")
+    return pd.Timestamp(as_of).normalize() if as_of else pd.Timestamp.today().normalize()
+
+# The current time of day on the as-of day, for report timestamps
+def as_of_now():
+    now = pd.Timestamp.now()
+    return as_of_date() + (now - now.normalize())
+
+
+def _source_dir(source, store_dir):
+    return os.path.join(store_dir, source)
+
+def _bar_path(ticker, source, store_dir):
+    return os.path.join(_source_dir(source, store_dir), f"{ticker}.feather")
+
+
+def load_manifest(source, store_dir=BAR_STORE_DIR):
+    path = os.path.join(_source_dir(source, store_dir), MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest, source, store_dir=BAR_STORE_DIR):
+    directory = _source_dir(source, store_dir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def normalize_bars(bars):
+    if bars is None or bars.empty:
+        return None
+
+    bars = bars.copy()
+    if isinstance(bars.index, pd.MultiIndex):
+        bars.index = bars.index.get_level_values(-1)
+    index = pd.DatetimeIndex(bars.index)
+    if index.tz is not None:
+        index = index.tz_convert('America/New_York').tz_localize(None)
+    bars.index = index.normalize()
+    bars.index.name = 'datetime'
+
+    bars = bars[BAR_COLUMNS].apply(pd.to_numeric, errors='coerce').astype('float64')
+    bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+    return bars.dropna()
+
+
+# Bar files are uncompressed Feather, so reads go through a memory map and
+# only the requested date range is ever copied out of the page cache.
+def _read_table(ticker, source, start, end, store_dir):
+    path = _bar_path(ticker, source, store_dir)
+    if not os.path.exists(path):
+        return None
+
+    table = feather.read_table(path, memory_map=True)
+    dates = table.column('datetime').to_numpy()
+    first = 0 if start is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+    last = len(dates) if end is None else np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), side='right')
+    return table.slice(first, max(0, last - first))
+
+def load_bars(ticker, source, start=None, end=None, store_dir=BAR_STORE_DIR):
+    table = _read_table(ticker, source, start, end, store_dir)
+    if table is None:
+        return None
+    return table.to_pandas().set_index('datetime')
+
+# Same range as load_bars but as (dates, {column: array}) views of the mapped
+# file, without building a DataFrame
+def load_arrays(ticker, source, start=None, end=None, columns=BAR_COLUMNS, store_dir=BAR_STORE_DIR):
+    table = _read_table(ticker, source, start, end, store_dir)
+    if table is None:
+        return None, {}
+    table = table.combine_chunks()
+    dates = table.column('datetime').chunk(0).to_numpy() if table.num_rows else np.array([], dtype='datetime64[ns]')
+    arrays = {
+        col: table.column(col).chunk(0).to_numpy() if table.num_rows else np.array([], dtype='float64')
+        for col in columns
+    }
+    return dates, arrays
+
+def save_bars(ticker, bars, source, store_dir=BAR_STORE_DIR):
+    os.makedirs(_source_dir(source, store_dir), exist_ok=True)
+    path = _bar_path(ticker, source, store_dir)
+    bars.reset_index().to_feather(path + ".tmp", compression='uncompressed')
+    os.replace(path + ".tmp", path)
+
+
+def last_bar_date(ticker, source, store_dir=BAR_STORE_DIR):
+    return load_manifest(source, store_dir).get(ticker, {}).get('last')
+
+# Stored date coverage as ('YYYY-MM-DD' first, 'YYYY-MM-DD' last) or None.
+# 'first' is the earliest start ever fetched, which can precede the first
+# bar (e.g. a later listing), so that range is not requested again.
+def coverage(ticker, source, store_dir=BAR_STORE_DIR):
+    entry = load_manifest(source, store_dir).get(ticker)
+    if not entry:
+        return None
+    return entry.get('first'), entry.get('last')
+
+
+def _revised(stored, fetched, date):
+    if date not in fetched.index:
+        return False
+    # Adjusted providers rewrite old bars; compare an overlapping close
+    old_close = stored.at[date, 'Close']
+    new_close = fetched.at[date, 'Close']
+    return abs(new_close - old_close) > REVISION_TOLERANCE * abs(old_close)
+
+def _merge_bars(stored, fetched):
+    if stored is None:
+        return fetched, False
+
+    overlap = stored.index.intersection(fetched.index)
+    revised = len(overlap) > 0 and _revised(stored, fetched, overlap[0])
+    merged = pd.concat([stored[stored.index < fetched.index[0]], fetched])
+    return merged, revised
+
+def _prepend_bars(stored, fetched):
+    revised = _revised(stored, fetched, stored.index[0])
+    merged = pd.concat([fetched[fetched.index < stored.index[0]], stored])
+    return merged, revised
+
+def _first_stored_date(ticker, source, store_dir):
+    dates, _ = load_arrays(ticker, source, columns=[], store_dir=store_dir)
+    return pd.Timestamp(dates[0]).strftime('%Y-%m-%d') if len(dates) else None
+
+
+# `fetch(tickers, start_date, end_date)` must return {ticker: DataFrame}.
+# Only ranges outside the stored coverage are fetched: the front from
+# start_date up to the first stored day, and the back from the last stored
+# bar (re-fetched so partial or revised bars get replaced).  Tickers sharing
+# a range go in one call.  With load=False only the store is updated and
+# nothing is read back.
+def update_bars(tickers, fetch, source, start_date=DEFAULT_START_DATE, end_date=None, store_dir=BAR_STORE_DIR, load=True):
+    with _update_lock:
+        return _update_bars(tickers, fetch, source, start_date, end_date, store_dir, load)
+
+def _update_bars(tickers, fetch, source, start_date, end_date, store_dir, load=True):
+    tickers = list(dict.fromkeys(tickers))
+    start_date = pd.Timestamp(start_date).strftime('%Y-%m-%d')
+    end_date = None if end_date is None else pd.Timestamp(end_date).strftime('%Y-%m-%d')
+    manifest = load_manifest(source, store_dir)
+
+    front_groups = {}
+    back_groups = {}
+    for ticker in tickers:
+        if ticker in manifest and not os.path.exists(_bar_path(ticker, source, store_dir)):
+            del manifest[ticker]
+        entry = manifest.get(ticker)
+        if entry is None:
+            if end_date is None or start_date < end_date:
+                back_groups.setdefault(start_date, []).append(ticker)
+            continue
+
+        if 'first' not in entry:  # stores written before coverage was tracked
+            entry['first'] = _first_stored_date(ticker, source, store_dir) or entry['last']
+        if start_date < entry['first']:
+            front_groups.setdefault(entry['first'], []).append(ticker)
+        # 'through' is the exclusive end the store was last brought up to;
+        # the last bar itself can be days earlier (weekends, holidays)
+        if end_date is None or entry.get('through', entry['last']) < end_date:
+            back_groups.setdefault(entry['last'], []).append(ticker)
+
+    # Days before today are final, so a fetch up to `end_date` covers them
+    today = as_of_date().strftime('%Y-%m-%d')
+    through = today if end_date is None else min(end_date, today)
+
+    full_refetch = []
+    for fetch_start, group in back_groups.items():
+        try:
+            fetched = fetch(group, fetch_start, end_date)
+        except Exception as e:
+            print(f"❌ Failed to update bars for {', '.join(group)}: {e}")
+            continue
+
+        for ticker in group:
+            bars = normalize_bars(fetched.get(ticker))
+            if bars is None:
+                continue
+
+            stored = load_bars(ticker, source, store_dir=store_dir) if ticker in manifest else None
+            merged, revised = _merge_bars(stored, bars)
+            if revised:
+                full_refetch.append(ticker)
+                continue
+
+            save_bars(ticker, merged, source, store_dir)
+            first = manifest.get(ticker, {}).get('first', start_date)
+            manifest[ticker] = {'first': first, 'last': merged.index[-1].strftime('%Y-%m-%d'), 'through': through}
+
+    for first, group in front_groups.items():
+        group = [t for t in group if t not in full_refetch]
+        if not group:
+            continue
+        # One day past the stored start so the first stored bar overlaps
+        fetch_end = (pd.Timestamp(first) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+        try:
+            fetched = fetch(group, start_date, fetch_end)
+        except Exception as e:
+            print(f"❌ Failed to backfill bars for {', '.join(group)}: {e}")
+            continue
+
+        for ticker in group:
+            bars = normalize_bars(fetched.get(ticker))
+            if bars is not None:
+                stored = load_bars(ticker, source, store_dir=store_dir)
+                merged, revised = _prepend_bars(stored, bars)
+                if revised:
+                    full_refetch.append(ticker)
+                    continue
+                save_bars(ticker, merged, source, store_dir)
+            manifest[ticker]['first'] = start_date
+
+    if full_refetch:
+        print(f"♻️ History revised for {', '.join(full_refetch)}, re-downloading")
+        # Keep everything that was covered, not just the requested range
+        refetch_start = min([start_date] + [manifest[t]['first'] for t in full_refetch if t in manifest])
+        try:
+            fetched = fetch(full_refetch, refetch_start, end_date)
+        except Exception as e:
+            print(f"❌ Failed to re-download bars: {e}")
+            fetched = {}
+        for ticker in full_refetch:
+            bars = normalize_bars(fetched.get(ticker))
+            if bars is None:
+                continue
+            save_bars(ticker, bars, source, store_dir)
+            manifest[ticker] = {'first': refetch_start, 'last': bars.index[-1].strftime('%Y-%m-%d'), 'through': through}
+
+    save_manifest(manifest, source, store_dir)
+    if not load:
+        return None
+
+    bars_by_ticker = {}
+    for ticker in tickers:
+        bars = load_bars(ticker, source, store_dir=store_dir)
+        if bars is not None and not bars.empty:
+            bars_by_ticker[ticker] = bars
+    return bars_by_ticker
+
+
+# yf.download catches every per-ticker error (rate limits included) and just
+# leaves that ticker out, so tickers it dropped because of a rate limit are
+# reported as one and re-requested by the scheduler
+class IncompleteDownload(Exception):
+    status_code = 429
+
+    def __init__(self, missing):
+        super().__init__(f"rate limited for {', '.join(missing)}")
+        self.missing = missing
+
+
+# Collects the per-ticker errors yf.download logs instead of raising, as
+# "['AAA', 'BBB']: YFRateLimitError('Too Many Requests...')"
+class _DownloadErrors(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.errors = {}
+
+    def emit(self, record):
+        symbols, sep, error = record.getMessage().partition(']: ')
+        if not sep:
+            return
+        try:
+            symbols = ast.literal_eval(symbols.strip() + ']')
+        except (ValueError, SyntaxError):
+            return
+        for symbol in symbols:
+            self.errors[str(symbol).upper()] = error
+
+def _rate_limit_error(error):
+    error = error.lower()
+    return 'ratelimit' in error.replace(' ', '') or 'too many requests' in error
+
+
+def _split_download(data, tickers):
+    bars_by_ticker = {}
+    if data is None or data.empty:
+        return bars_by_ticker
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            bars = data[ticker]
+        else:
+            bars = data
+        bars = bars.dropna(how='all')
+        if not bars.empty:
+            bars_by_ticker[ticker] = bars
+    return bars_by_ticker
+
+# Downloads in chunks of `chunk_size` symbols, each charged one token per
+# symbol still pending (yfinance sends one request per symbol).  Only
+# symbols that were rate limited are retried; the rest (delisted, unknown
+# or misspelled symbols such as BRK.B for BRK-B) are reported once.
+def fetch_yfinance_bars(tickers, start_date, end_date, chunk_size=YFINANCE_CHUNK_SIZE):
+    import yfinance as yf
+
+    bars_by_ticker = {}
+    unavailable = []
+
+    def download(pending):
+        logger = logging.getLogger('yfinance')
+        errors = _DownloadErrors()
+        logger.addHandler(errors)
+        try:
+            with api_call('yfinance.download'):
+                data = yf.download(
+                    list(pending), start=start_date, end=end_date,
+                    auto_adjust=True, group_by='ticker', progress=False
+                )
+        finally:
+            logger.removeHandler(errors)
+        bars_by_ticker.update(_split_download(data, pending))
+
+        missing = [t for t in pending if t not in bars_by_ticker]
+        pending[:] = [t for t in missing if _rate_limit_error(errors.errors.get(t.upper(), ''))]
+        unavailable.extend(t for t in missing if t not in pending)
+        if pending:
+            raise IncompleteDownload(list(pending))
+
+    tickers = list(dict.fromkeys(tickers))
+    for i in range(0, len(tickers), chunk_size):
+        pending = tickers[i:i + chunk_size]
+        try:
+            request('yfinance', download, pending, cost=lambda: len(pending))
+        except IncompleteDownload as e:
+            print(f"⚠️ No yfinance bars for {', '.join(e.missing)}, still rate limited after retries")
+        except Exception as e:
+            print(f"❌ Failed to download bars for {', '.join(pending)}: {e}")
+    if unavailable:
+        print(f"⚠️ No yfinance bars for {', '.join(unavailable)}")
+    return bars_by_ticker
@@ -0,0 +1,273 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+# Offline benchmarks for the indicator, signal and backtest hot paths on
+# synthetic OHLCV.  Results (best wall time, throughput, peak traced memory)
+# go to a JSON file that later runs can be compared against:
+#
+#   python benchmark.py --save                      # writes benchmark_baseline.json
+#   python benchmark.py --compare benchmark_baseline.json
+
+BENCHMARK_FILE = "benchmark_baseline.json"
+TICKER_COUNTS = (50, 500, 5000)
+YEAR_SPANS = (1, 10)
+TRADING_DAYS_PER_YEAR = 252
+SEED = 7
+
+# Functions that take one ticker at a time run on the first PER_TICKER_SAMPLE
+# tickers; a Cerebro run is slow enough that only CEREBRO_SAMPLE are timed
+PER_TICKER_SAMPLE = 100
+CEREBRO_SAMPLE = 5
+
+REPEAT = 3
+CASE_TIME_BUDGET = 10.0
+REGRESSION_TOLERANCE = 0.10
+
+
+def synthetic_bars(tickers, years, seed=SEED, end='2024-12-31'):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=TRADING_DAYS_PER_YEAR * years, name='datetime')
+    days = len(dates)
+
+    bars_by_ticker = {}
+    for i in range(tickers):
+        # Geometric random walk with a per-ticker drift and volatility, so
+        # some tickers trend and signals of both kinds occur
+        drift = rng.normal(0.0003, 0.0005)
+        volatility = rng.uniform(0.01, 0.04)
+        close = rng.uniform(10, 500) * np.exp(np.cumsum(rng.normal(drift, volatility, days)))
+        open_ = close * np.exp(rng.normal(0, volatility / 4, days))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, volatility / 2, days))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, volatility / 2, days))
+        volume = rng.integers(100_000, 10_000_000, days).astype('float64')
+        bars_by_ticker[f"T{i:04d}"] = pd.DataFrame(
+            {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=dates
+        )
+    return bars_by_ticker
+
+
+def _sample(bars_by_ticker, count):
+    return dict(list(bars_by_ticker.items())[:count])
+
+def _bar_count(bars_by_ticker):
+    return sum(len(bars) for bars in bars_by_ticker.values())
+
+
+# === Cases ===
+# Each case does its setup untimed and returns (timed callable, items, unit)
+
+def case_compute_rsi(bars_by_ticker):
+    from analyze import compute_rsi
+    closes = [bars['Close'] for bars in _sample(bars_by_ticker, PER_TICKER_SAMPLE).values()]
+    return lambda: [compute_rsi(close) for close in closes], sum(map(len, closes)), 'bars'
+
+def case_compute_srsi(bars_by_ticker):
+    from analyze import compute_rsi, compute_srsi
+    rsis = [compute_rsi(bars['Close']) for bars in _sample(bars_by_ticker, PER_TICKER_SAMPLE).values()]
+    return lambda: [compute_srsi(rsi) for rsi in rsis], sum(map(len, rsis)), 'bars'
+
+def case_compute_indicators(bars_by_ticker):
+    from bot import compute_indicators
+    sample = _sample(bars_by_ticker, PER_TICKER_SAMPLE)
+    return lambda: [compute_indicators(bars) for bars in sample.values()], _bar_count(sample), 'bars'
+
+def _indicator_frames(bars_by_ticker):
+    from indicators import compute_universe
+    return list(compute_universe(_sample(bars_by_ticker, PER_TICKER_SAMPLE)).values())
+
+def case_check_buy_signal(bars_by_ticker):
+    from bot import check_buy_signal
+    frames = _indicator_frames(bars_by_ticker)
+    return lambda: [check_buy_signal(df) for df in frames], len(frames), 'calls'
+
+def case_check_sell_signal(bars_by_ticker):
+    from bot import check_sell_signal
+    frames = _indicator_frames(bars_by_ticker)
+    return lambda: [check_sell_signal(df, 30.0) for df in frames], len(frames), 'calls'
+
+def _report_rows(bars_by_ticker):
+    from indicators import compute_latest
+    latest = compute_latest(bars_by_ticker)
+    return pd.DataFrame({
+        'RSI': latest['RSI'],
+        'SRSI': latest['SRSI'],
+        'Price_vs_MA20(%)': (latest['Close'] - latest['MA20']) / latest['MA20'] * 100,
+        'Price_vs_MA50(%)': (latest['Close'] - latest['MA50']) / latest['MA50'] * 100,
+        'PE_Ratio': np.linspace(5, 60, len(latest)),
+    }, index=latest.index)
+
+def case_analyze_entry(bars_by_ticker):
+    from analyze import analyze_entry
+    rows = list(_report_rows(bars_by_ticker).itertuples(index=False, name=None))
+    return lambda: [analyze_entry(*row, html_format=True) for row in rows], len(rows), 'calls'
+
+def case_analyze_exit(bars_by_ticker):
+    from analyze import analyze_exit
+    rows = list(_report_rows(bars_by_ticker).itertuples(index=False, name=None))
+    return lambda: [analyze_exit(rsi, vs20, vs50, previous_rsi=30.0) for rsi, _, vs20, vs50, _ in rows], len(rows), 'calls'
+
+def case_compute_latest(bars_by_ticker):
+    from indicators import compute_latest
+    return lambda: compute_latest(bars_by_ticker), _bar_count(bars_by_ticker), 'bars'
+
+def case_evaluate_signals(bars_by_ticker):
+    from indicators import compute_latest
+    from signals import evaluate_signals
+    latest = compute_latest(bars_by_ticker)
+    entry_rsi = {ticker: 30.0 for ticker in latest.index[::2]}
+    return lambda: evaluate_signals(latest, entry_rsi), len(latest), 'tickers'
+
+def case_evaluate_report(bars_by_ticker):
+    from signals import evaluate_report
+    metrics = _report_rows(bars_by_ticker)
+    previous_rsi = {ticker: 30.0 for ticker in metrics.index[::2]}
+    return lambda: evaluate_report(metrics, previous_rsi), len(metrics), 'tickers'
+
+def case_vector_backtest(bars_by_ticker):
+    from vector_backtest import run_backtest
+    return lambda: run_backtest(bars_by_ticker), _bar_count(bars_by_ticker), 'bars'
+
+def case_cerebro_backtest(bars_by_ticker):
+    from backtrade import run_cerebro
+    sample = _sample(bars_by_ticker, CEREBRO_SAMPLE)
+    return lambda: [run_cerebro(ticker, bars) for ticker, bars in sample.items()], _bar_count(sample), 'bars'
+
+CASES = {
+    'analyze.compute_rsi': case_compute_rsi,
+    'analyze.compute_srsi': case_compute_srsi,
+    'bot.compute_indicators': case_compute_indicators,
+    'bot.check_buy_signal': case_check_buy_signal,
+    'bot.check_sell_signal': case_check_sell_signal,
+    'analyze.analyze_entry': case_analyze_entry,
+    'analyze.analyze_exit': case_analyze_exit,
+    'indicators.compute_latest': case_compute_latest,
+    'signals.evaluate_signals': case_evaluate_signals,
+    'signals.evaluate_report': case_evaluate_report,
+    'vector_backtest.run_backtest': case_vector_backtest,
+    'backtrade.RSISRSIStrategy': case_cerebro_backtest,
+}
+
+
+def time_call(func, repeat=REPEAT, budget=CASE_TIME_BUDGET):
+    best = None
+    spent = 0.0
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        if spent >= budget:
+            break
+    return best
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmarks(ticker_counts=TICKER_COUNTS, year_spans=YEAR_SPANS, cases=None,
+                   repeat=REPEAT, memory=True, seed=SEED):
+    cases = cases or list(CASES)
+    results = []
+    for tickers in ticker_counts:
+        for years in year_spans:
+            bars_by_ticker = synthetic_bars(tickers, years, seed)
+            print(f"📦 {tickers} tickers x {years}y ({_bar_count(bars_by_ticker):,} bars)")
+            for name in cases:
+                func, items, unit = CASES[name](bars_by_ticker)
+                seconds = time_call(func, repeat)
+                result = {
+                    'case': name, 'tickers': tickers, 'years': years,
+                    'items': items, 'unit': unit,
+                    'seconds': seconds, 'throughput': items / seconds if seconds else None,
+                    'peak_mb': peak_memory(func) / 2**20 if memory else None,
+                }
+                results.append(result)
+                memory_note = f", peak {result['peak_mb']:.1f} MB" if memory else ""
+                print(f"  ⏱️ {name:<30} {seconds * 1000:10.2f} ms  {result['throughput']:14,.0f} {unit}/s{memory_note}")
+            del bars_by_ticker
+    return results
+
+def environment():
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def result_key(result):
+    return f"{result['case']}[{result['tickers']}x{result['years']}y]"
+
+# Prints each case's time against the baseline; returns the keys of cases
+# that got slower by more than `tolerance`
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    previous = {result_key(result): result for result in baseline['results']}
+    regressions = []
+    print(f"\n📊 Compared with baseline from {baseline['environment'].get('created', '?')}:")
+    for result in results:
+        key = result_key(result)
+        if key not in previous:
+            print(f"  🆕 {key}")
+            continue
+        ratio = result['seconds'] / previous[key]['seconds']
+        marker = "🔴" if ratio > 1 + tolerance else "🟢" if ratio < 1 - tolerance else "⚪"
+        memory_note = ""
+        if result['peak_mb'] is not None and previous[key].get('peak_mb'):
+            memory_note = f", memory x{result['peak_mb'] / previous[key]['peak_mb']:.2f}"
+        print(f"  {marker} {key:<50} x{ratio:.2f} time{memory_note}")
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark indicators, signals and backtests on synthetic bars")
+    parser.add_argument('--tickers', default=",".join(map(str, TICKER_COUNTS)), help="comma-separated ticker counts")
+    parser.add_argument('--years', default=",".join(map(str, YEAR_SPANS)), help="comma-separated history lengths")
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help="run only these cases")
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--save', nargs='?', const=BENCHMARK_FILE, metavar='FILE', help="write results as a baseline")
+    parser.add_argument('--compare', metavar='FILE', help="compare with a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        [int(n) for n in args.tickers.split(',')], [int(n) for n in args.years.split(',')],
+        args.case, args.repeat, memory=not args.no_memory
+    )
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"💾 Saved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
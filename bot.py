@@ -1,107 +1,76 @@
+import time
+STARTED = time.perf_counter()
 
-import alpaca
-import ta
-import pandas as pd
 import os
-from datetime import ( date, datetime)
-import time
-from email_sender import send_email 
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
-from alpaca.trading.requests import (
-    LimitOrderRequest,
-    MarketOrderRequest,
-    StopOrderRequest,
-)
-from alpaca.trading.enums import (
-    OrderSide,
-    OrderType,
-    QueryOrderStatus,
-    TimeInForce,
-)
-from alpaca.trading.requests import GetOrdersRequest
-
-
-DOLLARS_PER_TRADE = 100
-
-API_KEY = os.environ["API_KEY_PAPER"]
-SECRET_KEY = os.environ["SECRET_KEY_PAPER"]
-BASE_URL = os.environ["BASE_URL_PAPER"]
-
-client = StockHistoricalDataClient(API_KEY, SECRET_KEY)
-trading_client = TradingClient(API_KEY, SECRET_KEY, paper=True)  # Use paper trading
-
-
-POSITIONS_CSV = "positions.csv"
+import json
+from datetime import datetime, timezone
+from email_sender import flush_emails, send_email
+from instrumentation import InstrumentedClient, profiling, stage, timed, write_profile
+from scheduler import DATA, ORDERS, ScheduledClient
+
+# pandas, alpaca and the indicator kernel are imported where they are used,
+# so importing bot costs nothing and needs no credentials; main() runs it.
+
+BARS_CHUNK_SIZE = 100
+
+# Indicator state per ticker through the last complete daily bar, which the
+# pre-screen reads instead of fetching bars for the whole universe
+BOT_INDICATOR_STATE_FILE = "bot_indicator_state.json"
+
+_clients = {}
+
+# Both clients share the account's Alpaca rate limit; trading calls go in
+# the order lane ahead of queued bar requests, and every attempt is counted
+def scheduled_client(client, endpoint, priority, coalesce=False):
+    return ScheduledClient(InstrumentedClient(client, endpoint), 'alpaca', priority, coalesce=coalesce)
+
+def get_data_client():
+    if 'data' not in _clients:
+        from alpaca.data.historical import StockHistoricalDataClient
+        _clients['data'] = scheduled_client(
+            StockHistoricalDataClient(os.environ["API_KEY_PAPER"], os.environ["SECRET_KEY_PAPER"]),
+            'alpaca.data', DATA, coalesce=True
+        )
+    return _clients['data']
+
+def get_trading_client():
+    if 'trading' not in _clients:
+        from alpaca.trading.client import TradingClient
+        # Use paper trading
+        _clients['trading'] = scheduled_client(
+            TradingClient(os.environ["API_KEY_PAPER"], os.environ["SECRET_KEY_PAPER"], paper=True),
+            'alpaca.trading', ORDERS
+        )
+    return _clients['trading']
+
 
 def load_positions():
-    if os.path.exists(POSITIONS_CSV):
-        return pd.read_csv(POSITIONS_CSV, parse_dates=['date'], dayfirst=True)
-    else:
-        return pd.DataFrame(columns=[
-            'ticker', 'date', 'close', 'entry_rsi', 'srsi', 'ma20', 'status', 'sell_price', 'gain_loss'
-        ])
+    import positions_store
+    return positions_store.load_positions()
 
-def save_positions(positions_df):
-    positions_df.to_csv(POSITIONS_CSV, index=False)
 
+# High-water mark of the order history already reconciled
+SYNC_STATE_FILE = "sync_state.json"
 
-def place_bracket_order(ticker, entry_price):
-    tp = round(entry_price * 1.20, 2)
-    sl = round(entry_price * 0.80, 2)
+def load_sync_state():
+    if os.path.exists(SYNC_STATE_FILE):
+        with open(SYNC_STATE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
 
-    market_buy = MarketOrderRequest(
-        symbol=ticker,
-        notional=DOLLARS_PER_TRADE,
-        side=OrderSide.BUY,
-        type=OrderType.MARKET,
-        time_in_force=TimeInForce.DAY,       
-    )
+def save_sync_state(state):
+    with open(SYNC_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
 
-    try:
-        order = trading_client.submit_order(market_buy)
-        print(f"🛒 Buy order submitted for {ticker} (${DOLLARS_PER_TRADE})")
-        order_id = order.id
-        for _ in range(10):
-            fetched = trading_client.get_order_by_id(order_id)
-            if fetched.filled_qty and float(fetched.filled_qty) > 0:
-                filled_qty = float(fetched.filled_qty)
-                print(f"✅ Order filled: {filled_qty} shares of {ticker}")
-                break
-            time.sleep(2)
-        else:
-            print("⚠️ Order not filled in time")
-            return
-        
-        limit_tp_sell = LimitOrderRequest(
-            symbol=ticker,
-            qty=filled_qty,
-            limit_price=tp,
-            side=OrderSide.SELL,
-            time_in_force=TimeInForce.DAY
-        )
-        trading_client.submit_order(limit_tp_sell)
-        print(f"📈 Take Profit order placed at ${tp}")
-
-        # limit_sl_sell = StopOrderRequest(
-        #     symbol=ticker,
-        #     qty=filled_qty,
-        #     stop_price=sl,
-        #     side=OrderSide.SELL,
-        #     time_in_force=TimeInForce.DAY
-        # )
-        # trading_client.submit_order(limit_sl_sell)
-        # print(f"🛑 Stop Loss order placed at ${sl}")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to execute trade for {ticker}: {e}")
-        return False
+
+def place_bracket_order(ticker, entry_price):
+    from orders import place_entry_orders
+    return place_entry_orders(get_trading_client(), [(ticker, entry_price)])[ticker]
 
 def place_sell_order(ticker, qty):
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
     order = MarketOrderRequest(
         symbol=ticker,
         qty=qty,
@@ -110,30 +79,52 @@ def place_sell_order(ticker, qty):
     )
 
     try:
-        response = trading_client.submit_order(order)
+        response = get_trading_client().submit_order(order)
         print(f"💰 Sell order placed for {ticker} — Qty: {qty}")
         return response
     except Exception as e:
         print(f"❌ Failed to place sell order for {ticker}: {e}")
         return None
 
-def fetch_data(ticker, start_date, end_date):
-    request_params = StockBarsRequest(
-        symbol_or_symbols=ticker,
-        timeframe=TimeFrame.Day,
-        start=start_date,
-        end=end_date
-    )
-    bars = client.get_stock_bars(request_params).df
+@timed('fetch_bars')
+def fetch_bars(tickers, start_date, end_date, chunk_size=BARS_CHUNK_SIZE):
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    tickers = list(dict.fromkeys(tickers))
+    bars_by_ticker = {}
+
+    # One multi-symbol request per chunk instead of one request per ticker
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        request_params = StockBarsRequest(
+            symbol_or_symbols=chunk,
+            timeframe=TimeFrame.Day,
+            start=start_date,
+            end=end_date
+        )
+        try:
+            bars = get_data_client().get_stock_bars(request_params).df
+        except Exception as e:
+            print(f"❌ Failed to fetch bars for {', '.join(chunk)}: {e}")
+            continue
 
-    if bars is None or bars.empty:
-        print(f"⚠️ No data found for {ticker}")
-        return None
+        if bars is None or bars.empty:
+            continue
+
+        bars = bars[['open', 'high', 'low', 'close', 'volume']]
+        bars.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+        for symbol, symbol_bars in bars.groupby(level='symbol', sort=False):
+            bars_by_ticker[symbol] = symbol_bars
 
-    bars = bars[['open', 'high', 'low', 'close', 'volume']]
-    bars.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-    bars.index.name = 'datetime'
-    return bars
+    for ticker in tickers:
+        if ticker not in bars_by_ticker:
+            print(f"⚠️ No data found for {ticker}")
+
+    return bars_by_ticker
+
+def fetch_data(ticker, start_date, end_date):
+    return fetch_bars([ticker], start_date, end_date).get(ticker)
 
 def check_buy_signal(df):
     df = df.dropna()
@@ -196,77 +187,110 @@ def check_sell_signal(df, entry_rsi):
 
     return False, {}
 
+def buy_info_from_signal(row):
+    return {
+        'date': row['Date'],
+        'close': row['Close'],
+        'entry_rsi': row['RSI'],
+        'srsi': row['SRSI'],
+        'ma20': row['MA20']
+    }
+
+def sell_info_from_signal(row):
+    from signals import reason_labels
+    return {
+        'date': row['Date'],
+        'close': row['Close'],
+        'rsi': row['RSI'],
+        'srsi': row['SRSI'],
+        'ma20': row['MA20'],
+        'ma50': row['MA50'],
+        'rsi_jump': row['rsi_jump'],
+        'price_vs_ma20': row['price_vs_ma20'],
+        'price_vs_ma50': row['price_vs_ma50'],
+        'reasons': reason_labels(row['sell_reasons'])
+    }
+
+@timed('sync_positions_with_alpaca')
 def sync_positions_with_alpaca():
+    import pandas as pd
+    import positions_store
+    from orders import cancel_open_orders, filled_sells_by_symbol, next_sync_mark
+
     print("🔄 Syncing open positions with Alpaca...")
+    trading_client = get_trading_client()
+    sync_started = datetime.now(timezone.utc)
 
     # Load open positions
-    positions_df = load_positions()
-    open_positions = positions_df[positions_df['status'] == 'open']
+    open_positions = positions_store.open_positions()
 
     if open_positions.empty:
+        save_sync_state({'orders_after': sync_started.isoformat()})
         print("✅ No open positions to sync.")
         return
-    
-    order_filter = GetOrdersRequest(status=QueryOrderStatus.ALL)
-    all_orders = trading_client.get_orders(order_filter)
 
+    # Only orders newer than the last reconciled point; on the first run,
+    # nothing older than the earliest open position can have closed it
+    after = load_sync_state().get('orders_after')
+    if after:
+        after = datetime.fromisoformat(after)
+    else:
+        earliest = open_positions['date'].min()
+        after = None if pd.isna(earliest) else earliest.to_pydatetime()
+
+    held = set(open_positions['ticker'])
+    filled_sells = filled_sells_by_symbol(trading_client, held, after)
 
     updated = False
+    closed = set()
 
     for _, row in open_positions.iterrows():
         ticker = row['ticker']
         buy_price = float(row['close'])
 
-        # Find any filled SELL order for this ticker
-        for order in all_orders:
-            if (
-                order.symbol == ticker and
-                order.side == OrderSide.SELL and
-                order.filled_at is not None
-            ):
-                sell_price = float(order.filled_avg_price)
-                gain_loss = round((sell_price - buy_price) / buy_price * 100, 2)
+        # Filled SELL order for this ticker, if any
+        order = filled_sells.get(ticker)
+        if order is None or ticker in closed:
+            continue
 
-                # Update the DataFrame
-                positions_df.loc[
-                    (positions_df['ticker'] == ticker) & (positions_df['status'] == 'open'),
-                    ['status', 'sell_price', 'gain_loss']
-                ] = ['closed', sell_price, gain_loss]
+        sell_price = float(order.filled_avg_price)
+        gain_loss = round((sell_price - buy_price) / buy_price * 100, 2)
 
-                updated = True
-                print(f"✅ {ticker}: SELL order filled at ${sell_price:.2f}, Gain/Loss: {gain_loss}%")
+        positions_store.close_position(ticker, sell_price, gain_loss)
 
-                # Cancel all remaining open orders for this symbol (e.g. SL)
-                cancel_open_orders_for_symbol(ticker)
+        updated = True
+        closed.add(ticker)
+        print(f"✅ {ticker}: SELL order filled at ${sell_price:.2f}, Gain/Loss: {gain_loss}%")
 
-                break
+    # Cancel all remaining open orders for the closed symbols (e.g. SL) in one batch
+    failures = cancel_open_orders(trading_client, closed)
+    if failures:
+        print(f"⚠️ {len(failures)} leftover order(s) could not be canceled: "
+              f"{', '.join(sorted({symbol for symbol, _, _ in failures}))}")
 
     if updated:
-        save_positions(positions_df)
-        print("💾 Updated positions.csv with closed trades.")
+        print("💾 Updated positions store with closed trades.")
     else:
         print("🕵️ No filled SELL orders found.")
 
+    mark = next_sync_mark(trading_client, held - closed, sync_started)
+    save_sync_state({'orders_after': mark.isoformat()})
+
 
 def cancel_open_orders_for_symbol(ticker):
-    open_filter = GetOrdersRequest(status=QueryOrderStatus.OPEN, symbols=[ticker])
-    open_orders = trading_client.get_orders(open_filter)
+    from orders import cancel_open_orders
 
-    for order in open_orders:
-        try:
-            trading_client.cancel_order_by_id(order.id)
-            print(f"🚫 Canceled open order for {ticker} (ID: {order.id})")
-        except Exception as e:
-            print(f"❌ Failed to cancel order for {ticker}: {e}")
+    return cancel_open_orders(get_trading_client(), [ticker])
 
 
-def send_trade_summary_email():
+def send_trade_summary_email(buy_signals, watchlist, positions):
     if not buy_signals and not watchlist:
         print("📭 No trade summary to email.")
         return
     
     if buy_signals or watchlist:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+        from bar_store import as_of_now
+        timestamp = as_of_now().strftime("%Y-%m-%d %H:%M")
         subject = f"📈 Trading Summary — {timestamp}"
         body_lines = []
 
@@ -296,123 +320,241 @@ def send_trade_summary_email():
     )
 
 
+@timed('compute_indicators')
 def compute_indicators(df):
+    from indicators import compute_frame
+
     if df is None or df.empty:
         return None
     try:
-        df = df.copy()
-        df['RSI'] = ta.momentum.RSIIndicator(df['Close'], window=14).rsi()
-        df['SRSI'] = ta.momentum.StochRSIIndicator(df['Close']).stochrsi_k()
-        df['MA20'] = ta.trend.SMAIndicator(df['Close'], window=20).sma_indicator()
-        df['MA50'] = ta.trend.SMAIndicator(df['Close'], window=50).sma_indicator()
-        return df
+        return compute_frame(df)
     except Exception as e:
         print(f"❌ Failed to compute indicators: {e}")
         return None
 
 
-tickers = [
-        'AAPL', 'MSFT', 'NVDA', 'AMD', 'GOOGL', 'META',
-        'JPM', 'GS', 'BAC', 'JNJ', 'PFE', 'UNH', 'LLY',
-        'AMZN', 'DIS', 'HD', 'COST', 'DE', 'GE', 'XOM', 'CVX',
-        'DAL', 'EXPE', 'SPY', 'QQQ', 'XLK', 'XLF', 'SHOP', 'NET', 'ZS', 'SCHW', 'PYPL',
-        'MRK', 'BMY', 'ABBV', 'TMO', 'IBB',
-        'TGT', 'WMT', 'ULTA', 'MCD',
-        'NOC', 'RTX', 'LMT', 'FCX',
-        'IWM', 'XLV', 'XLE', 'ARKK',
-        #'SQ'
-    ]
-
-start_date = "2025-01-01"
-end_date = date.today().isoformat()
-
-sync_positions_with_alpaca()
-
-buy_signals = []
-positions_df = load_positions()
-open_positions_df = positions_df[positions_df['status'].fillna('open') == 'open']
-held_tickers = set(open_positions_df['ticker'].unique())
-
-watchlist = []
-positions = {
-    row['ticker']: {
-        'entry_rsi': row['entry_rsi'],
-        'date': row['date'],
-        'close': row['close'],
-        'srsi': row['srsi'],
-        'ma20': row['ma20']
-    }
-    for _, row in open_positions_df.iterrows()
-}
+def main():
+    with profiling():
+        run_daily()
+    write_profile('bot')
+
+
+def run_daily():
+    import positions_store
+    from bar_store import DEFAULT_START_DATE, as_of_date, load_bars, update_bars
+    from indicators import compute_latest, load_indicator_states, save_indicator_states
+    from signals import evaluate_signals
+    from orders import place_entry_orders
+    from universe import advance_states, load_universe, prescreen
+
+    print(f"⏱️ Startup: {time.perf_counter() - STARTED:.2f}s until dependencies were loaded")
+    trading_client = get_trading_client()
 
-for ticker, entry in positions.items():
-    df = fetch_data(ticker, start_date, end_date)
-    if df is None:
-        continue
+    tickers = load_universe()
 
-    df = compute_indicators(df)
-    if df is None:
-        continue
+    start_date = DEFAULT_START_DATE
+    end_date = as_of_date().strftime('%Y-%m-%d')
 
-    # ✅ Check buy condition
-    buy_signal, buy_info = check_buy_signal(df)
-    if buy_signal and ticker not in held_tickers:
-        entry_price = buy_info["close"]
-        success = place_bracket_order(ticker, entry_price=entry_price)
+    sync_positions_with_alpaca()
 
-        if success:
+    buy_signals = []
+    open_positions_df = positions_store.open_positions()
+    held_tickers = set(open_positions_df['ticker'].unique())
+
+    watchlist = []
+    positions = {
+        row['ticker']: {
+            'entry_rsi': row['entry_rsi'],
+            'date': row['date'],
+            'close': row['close'],
+            'srsi': row['srsi'],
+            'ma20': row['ma20']
+        }
+        for _, row in open_positions_df.iterrows()
+    }
+
+    # Top up the bar store once for the whole universe (only bars since each
+    # ticker's last stored one, in multi-symbol requests), so every
+    # IndicatorState is current before the pre-screen
+    universe = tickers + [t for t in positions if t not in tickers]
+    with stage('update_bars'):
+        update_bars(universe, fetch_bars, 'alpaca', start_date=start_date, end_date=end_date, load=False)
+
+    # Stage one: drop tickers that cannot reach the entry rule; held
+    # positions always go through
+    indicator_states = load_indicator_states(BOT_INDICATOR_STATE_FILE)
+    with stage('prescreen'):
+        advance_states(universe, indicator_states, 'alpaca', end_date)
+        tickers, _ = prescreen(tickers, indicator_states, end_date, keep=positions)
+    save_indicator_states(indicator_states, BOT_INDICATOR_STATE_FILE)
+
+    # The buy and sell passes both read from these
+    with stage('load_bars'):
+        bars_by_ticker = {}
+        for ticker in tickers + [t for t in positions if t not in tickers]:
+            bars = load_bars(ticker, 'alpaca')
+            if bars is not None and not bars.empty:
+                bars_by_ticker[ticker] = bars
+    # Buy and sell signals for every ticker in one vectorized pass
+    with stage('compute_indicators'):
+        latest = compute_latest(bars_by_ticker)
+    with stage('evaluate_signals'):
+        signals = evaluate_signals(latest, {ticker: entry['entry_rsi'] for ticker, entry in positions.items()})
+
+    # Entries are looked for across the pre-screened universe
+    entries = {}
+    for ticker in tickers:
+        if ticker not in signals.index:
+            continue
+        signal = signals.loc[ticker]
+
+        # ✅ Check buy condition
+        if signal['buy'] and ticker not in held_tickers:
+            entries[ticker] = buy_info_from_signal(signal)
+
+    # All entry orders go out together; take-profits follow each fill
+    with stage('place_entry_orders'):
+        filled = place_entry_orders(trading_client, [(ticker, info["close"]) for ticker, info in entries.items()])
+    for ticker, buy_info in entries.items():
+        if filled[ticker]:
             buy_info['ticker'] = ticker
             buy_info['status'] = 'open'
             buy_signals.append((ticker, buy_info))
-            positions_df = pd.concat([positions_df, pd.DataFrame([buy_info])], ignore_index=True)
-            entry_price = buy_info["close"]
-            
-
-save_positions(positions_df)
-
-print("\n👁️ Watchlist (Sell Alerts from Positions):")
-for ticker, entry in positions.items():
-    df = fetch_data(ticker, start_date, end_date)
-    if df is None:
-        continue
-    df = compute_indicators(df)
-    if df is None:
-        continue
-
-    sell_signal, sell_info = check_sell_signal(df, entry['entry_rsi'])
-    if sell_signal:
-      watchlist.append((ticker, sell_info))
-      print(f"🔴 {ticker} — SELL signal on {sell_info['date'].date()} @ ${sell_info['close']:.2f}")
-      print(f"Reasons: {', '.join(sell_info['reasons'])}")
-
-      # 🛑 Place a real sell order
-      #place_sell_order(ticker, qty=1)
-
-      # ✅ Compute gain/loss
-      sell_price = sell_info['close']
-      buy_price = float(entry['close'])
-      gain_loss = round((sell_price - buy_price) / buy_price * 100, 2)
-
-      # ⛔️ Update trade status and log results
-      positions_df.loc[
-          (positions_df['ticker'] == ticker) & (positions_df['status'] == 'open'),
-          ['status', 'sell_price', 'gain_loss']
-      ] = ['closed', sell_price, gain_loss]
-
-      print(f"📤 Trade closed for {ticker} — Sold at ${sell_price:.2f}, Gain/Loss: {gain_loss}%")
-
-save_positions(positions_df)
-
-print("\n🧾 Buy Signals Summary:")
-for ticker, info in buy_signals:
-    print(f"🟢 {ticker} — Buy on {info['date'].date()} @ ${info['close']:.2f} (RSI: {info['entry_rsi']:.2f}, SRSI: {info['srsi']:.2f})")
-
-print("\n📉 Sell Watchlist Summary:")
-if not watchlist:
-    print("No sell signals triggered.")
-else:
-    for ticker, info in watchlist:
-      print(f"🔴 {ticker} — Sell on {info['date'].date()} @ ${info['close']:.2f} "
-      f"(Reasons: {', '.join(info['reasons'])}, Gain/Loss: {gain_loss}%)")
-
-send_trade_summary_email()
\ No newline at end of file
+            positions_store.add_position(buy_info)
+    print(f"⏱️ Entry orders done {time.perf_counter() - STARTED:.2f}s after start")
+
+    print("\n👁️ Watchlist (Sell Alerts from Positions):")
+    for ticker, entry in positions.items():
+        if ticker not in signals.index:
+            continue
+        signal = signals.loc[ticker]
+
+        if signal['sell']:
+          sell_info = sell_info_from_signal(signal)
+          watchlist.append((ticker, sell_info))
+          print(f"🔴 {ticker} — SELL signal on {sell_info['date'].date()} @ ${sell_info['close']:.2f}")
+          print(f"Reasons: {', '.join(sell_info['reasons'])}")
+
+          # 🛑 Place a real sell order
+          #place_sell_order(ticker, qty=1)
+
+          # ✅ Compute gain/loss
+          sell_price = sell_info['close']
+          buy_price = float(entry['close'])
+          gain_loss = round((sell_price - buy_price) / buy_price * 100, 2)
+
+          # ⛔️ Update trade status and log results
+          with stage('close_position', ticker):
+              positions_store.close_position(ticker, sell_price, gain_loss)
+
+          print(f"📤 Trade closed for {ticker} — Sold at ${sell_price:.2f}, Gain/Loss: {gain_loss}%")
+
+    # positions.csv stays as a readable export of the store
+    positions_store.export_csv()
+
+    print("\n🧾 Buy Signals Summary:")
+    for ticker, info in buy_signals:
+        print(f"🟢 {ticker} — Buy on {info['date'].date()} @ ${info['close']:.2f} (RSI: {info['entry_rsi']:.2f}, SRSI: {info['srsi']:.2f})")
+
+    print("\n📉 Sell Watchlist Summary:")
+    if not watchlist:
+        print("No sell signals triggered.")
+    else:
+        for ticker, info in watchlist:
+          print(f"🔴 {ticker} — Sell on {info['date'].date()} @ ${info['close']:.2f} "
+          f"(Reasons: {', '.join(info['reasons'])}, Gain/Loss: {gain_loss}%)")
+
+    with stage('send_email'):
+        send_trade_summary_email(buy_signals, watchlist, positions)
+        flush_emails()
+
+    print(f"⏱️ Run finished {time.perf_counter() - STARTED:.2f}s after start")
+
+
+# Daemon mode: the same rules evaluated on every bar of a live (or replayed)
+# stream, so entries and exits fire during the session instead of on the
+# next scheduled run.  Today's bars count as a provisional daily bar.
+def run_daemon(feed=None):
+    import threading
+    import pandas as pd
+    import positions_store
+    from bar_store import DEFAULT_START_DATE, as_of_date, update_bars
+    from indicators import IndicatorState, update_from_bars
+    from orders import place_entry_orders
+    from stream import SignalDaemon, live_feed
+    from universe import load_universe
+
+    trading_client = get_trading_client()
+    sync_positions_with_alpaca()
+
+    open_positions_df = positions_store.open_positions()
+    positions = {row['ticker']: float(row['close']) for _, row in open_positions_df.iterrows()}
+    entry_rsi = {row['ticker']: row['entry_rsi'] for _, row in open_positions_df.iterrows()}
+    universe = load_universe()
+    symbols = universe + [t for t in positions if t not in universe]
+
+    # Indicator state through the last completed daily bar
+    today = as_of_date().strftime('%Y-%m-%d')
+    bars_by_ticker = update_bars(symbols, fetch_bars, 'alpaca', start_date=DEFAULT_START_DATE, end_date=today)
+    states = {}
+    for ticker, bars in bars_by_ticker.items():
+        closes = bars['Close']
+        states[ticker] = update_from_bars(IndicatorState(), closes[closes.index < pd.Timestamp(today)])
+    print(f"📡 Streaming bars for {len(states)} symbols")
+
+    lock = threading.Lock()
+
+    def on_buy(ticker, signal):
+        buy_info = buy_info_from_signal(signal)
+        if not place_entry_orders(trading_client, [(ticker, buy_info['close'])])[ticker]:
+            return False
+        buy_info['ticker'] = ticker
+        buy_info['status'] = 'open'
+        with lock:
+            positions[ticker] = float(buy_info['close'])
+            positions_store.add_position(buy_info)
+            positions_store.export_csv()
+        print(f"🟢 {ticker} — Buy on {buy_info['date']} @ ${buy_info['close']:.2f} "
+              f"(RSI: {buy_info['entry_rsi']:.2f}, SRSI: {buy_info['srsi']:.2f})")
+        return True
+
+    def on_sell(ticker, signal):
+        sell_info = sell_info_from_signal(signal)
+        sell_price = float(sell_info['close'])
+        with lock:
+            buy_price = positions.pop(ticker, None)
+            if buy_price is None:
+                held = positions_store.open_positions()
+                held = held[held['ticker'] == ticker]
+                if held.empty:
+                    print(f"⚠️ {ticker}: SELL signal but no open position, nothing to close")
+                    return
+                buy_price = float(held['close'].iloc[-1])
+            gain_loss = round((sell_price - buy_price) / buy_price * 100, 2)
+            positions_store.close_position(ticker, sell_price, gain_loss)
+            positions_store.export_csv()
+        print(f"🔴 {ticker} — SELL signal on {sell_info['date']} @ ${sell_price:.2f}")
+        print(f"Reasons: {', '.join(sell_info['reasons'])}")
+        print(f"📤 Trade closed for {ticker} — Sold at ${sell_price:.2f}, Gain/Loss: {gain_loss}%")
+
+    daemon = SignalDaemon(states, on_buy, on_sell, held=positions, entry_rsi=entry_rsi)
+    daemon.run(feed if feed is not None else live_feed(), list(states))
+    print(f"⏱️ Stream ended {time.perf_counter() - STARTED:.2f}s after start")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RSI/StochRSI trading bot")
+    parser.add_argument('--daemon', action='store_true', help="evaluate signals on a live bar stream")
+    parser.add_argument('--replay', metavar='CSV', help="daemon mode driven by recorded bars (symbol,timestamp,close)")
+    parser.add_argument('--speed', type=float, default=None, help="replay speed-up; default replays without waiting")
+    args = parser.parse_args()
+
+    if args.replay:
+        from stream import ReplayFeed
+        run_daemon(ReplayFeed.from_csv(args.replay, speed=args.speed))
+    elif args.daemon:
+        run_daemon()
+    else:
+        main()
@@ -1,14 +1,26 @@
 from email.message import EmailMessage
 import os
+import time
+import queue
+import atexit
 import smtplib
+import threading
+from instrumentation import api_call
 
-def send_email(subject, body, recipient_email, attachment_path=None, is_html=False):
-    EMAIL_ADDRESS = os.environ['EMAIL_ADDRESS']
-    EMAIL_PASSWORD = os.environ['EMAIL_PASSWORD']
+# Defaults are Gmail over SSL; point SMTP_HOST/SMTP_PORT at a local server
+# with SMTP_SSL=0 to test without sending anything
+SMTP_HOST = os.environ.get("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))
+SMTP_SSL = os.environ.get("SMTP_SSL", "1") != "0"
+SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", "30"))
+SEND_ATTEMPTS = int(os.environ.get("SMTP_SEND_ATTEMPTS", "3"))
+RETRY_DELAY = float(os.environ.get("SMTP_RETRY_DELAY", "2"))
 
+
+def build_message(subject, body, recipient_email, attachment_path=None, is_html=False):
     msg = EmailMessage()
     msg['Subject'] = subject
-    msg['From'] = EMAIL_ADDRESS
+    msg['From'] = os.environ['EMAIL_ADDRESS']
     msg['To'] = recipient_email
 
     if is_html:
@@ -22,7 +34,118 @@ def send_email(subject, body, recipient_email, attachment_path=None, is_html=Fal
                 f.read(), maintype='application', subtype='octet-stream',
                 filename=os.path.basename(attachment_path)
             )
+    return msg
+
+
+def connect(host=SMTP_HOST, port=SMTP_PORT, ssl=SMTP_SSL, timeout=SMTP_TIMEOUT):
+    smtp = smtplib.SMTP_SSL(host, port, timeout=timeout) if ssl else smtplib.SMTP(host, port, timeout=timeout)
+    password = os.environ.get('EMAIL_PASSWORD')
+    if password:
+        smtp.login(os.environ['EMAIL_ADDRESS'], password)
+    return smtp
+
+
+# Queues messages and delivers them from a background thread.  Whatever is
+# queued when the worker wakes up goes out as one batch over one logged-in
+# connection; a failed send reconnects and retries with a growing delay, and
+# messages that still fail end up in `failed` as (message, error).
+class Outbox:
+    def __init__(self, connect=connect, attempts=SEND_ATTEMPTS, retry_delay=RETRY_DELAY, sleep=time.sleep):
+        self.connect = connect
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self.sleep = sleep
+        self.queue = queue.Queue()
+        self.sent = 0
+        self.failed = []
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def send(self, msg):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self.worker.start()
+        self.queue.put(msg)
+
+    # Blocks until every queued message was sent or given up on
+    def flush(self):
+        self.queue.join()
+        return self.failed
+
+    def close(self):
+        with self.lock:
+            worker = self.worker
+            self.worker = None
+        if worker is not None and worker.is_alive():
+            self.queue.put(None)
+            worker.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            messages = [msg for msg in batch if msg is not None]
+            try:
+                if messages:
+                    self._deliver(messages)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def _deliver(self, messages):
+        smtp = None
+        try:
+            for msg in messages:
+                for attempt in range(self.attempts):
+                    try:
+                        if smtp is None:
+                            with api_call('smtp.connect'):
+                                smtp = self.connect()
+                        with api_call('smtp.send_message'):
+                            smtp.send_message(msg)
+                        self.sent += 1
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        smtp = _close(smtp)
+                        if attempt + 1 == self.attempts:
+                            print(f"❌ Failed to send email '{msg['Subject']}': {e}")
+                            self.failed.append((msg, e))
+                        else:
+                            self.sleep(self.retry_delay * 2 ** attempt)
+        finally:
+            _close(smtp)
+
+
+def _close(smtp):
+    if smtp is not None:
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+    return None
+
+
+_outbox = Outbox()
+
+# Queued messages are still delivered when the process exits
+atexit.register(_outbox.flush)
+
+
+# Queues the email and returns right away; pass wait=True to block until it
+# (and everything queued before it) has been handed to the SMTP server
+def send_email(subject, body, recipient_email, attachment_path=None, is_html=False, wait=False):
+    _outbox.send(build_message(subject, body, recipient_email, attachment_path, is_html))
+    if wait:
+        _outbox.flush()
 
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-        smtp.send_message(msg)
+def flush_emails():
+    return _outbox.flush()
@@ -0,0 +1,73 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import api_call
+from scheduler import request
+
+FUNDAMENTALS_FILE = "fundamentals_cache.json"
+FUNDAMENTALS_TTL_DAYS = float(os.environ.get("FUNDAMENTALS_TTL_DAYS", "7"))
+FUNDAMENTALS_WORKERS = int(os.environ.get("FUNDAMENTALS_WORKERS", "8"))
+
+
+def load_fundamentals(filename=FUNDAMENTALS_FILE):
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_fundamentals(cache, filename=FUNDAMENTALS_FILE):
+    with open(filename + ".tmp", 'w') as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(filename + ".tmp", filename)
+
+
+def fetch_fundamentals(ticker):
+    import yfinance as yf
+
+    def fetch_info():
+        with api_call('yfinance.info'):
+            return yf.Ticker(ticker).info
+
+    info = request('yfinance', fetch_info, key=('yfinance.info', ticker))
+    return {'trailingPE': info.get('trailingPE', None)}
+
+
+def is_stale(entry, ttl_days=FUNDAMENTALS_TTL_DAYS, now=None):
+    if not entry or 'fetched_at' not in entry:
+        return True
+    now = now or datetime.now(timezone.utc)
+    return now - datetime.fromisoformat(entry['fetched_at']) > timedelta(days=ttl_days)
+
+
+# Re-fetches entries older than the TTL in one parallel bulk pass.  A failed
+# fetch keeps the previous (stale) value so the report still has a P/E.
+def refresh_fundamentals(tickers, ttl_days=FUNDAMENTALS_TTL_DAYS, workers=FUNDAMENTALS_WORKERS,
+                         filename=FUNDAMENTALS_FILE, fetch=fetch_fundamentals):
+    cache = load_fundamentals(filename)
+    now = datetime.now(timezone.utc)
+    stale = [t for t in dict.fromkeys(tickers) if is_stale(cache.get(t), ttl_days, now)]
+    if not stale:
+        return cache
+
+    def fetch_one(ticker):
+        try:
+            return fetch(ticker)
+        except Exception as e:
+            print(f"⚠️ Fundamentals fetch failed for {ticker}, keeping cached value: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        fetched = list(pool.map(fetch_one, stale))
+
+    for ticker, values in zip(stale, fetched):
+        if values is not None:
+            cache[ticker] = {**values, 'fetched_at': now.isoformat()}
+
+    save_fundamentals(cache, filename)
+    print(f"📚 Refreshed fundamentals for {sum(v is not None for v in fetched)}/{len(stale)} stale tickers")
+    return cache
+
+
+def cached_pe_ratio(cache, ticker):
+    return cache.get(ticker, {}).get('trailingPE')
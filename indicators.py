@@ -0,0 +1,376 @@
+import pandas as pd
+import numpy as np
+import math
+import os
+import json
+from collections import deque
+
+RSI_WINDOW = 14
+SRSI_WINDOW = 14
+MA_WINDOWS = (20, 50)
+INDICATOR_STATE_FILE = "indicator_state.json"
+
+# Running MA sums are re-summed exactly this often to stop float drift
+MA_RESYNC_BARS = 250
+
+
+def _rsi_from_averages(avg_gain, avg_loss):
+    if avg_loss == 0:
+        return math.nan if avg_gain == 0 else 100.0
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+# Rolling RSI/StochRSI/SMA state for one ticker.  update() costs O(1) per bar
+# and matches compute_matrix() over the same history.
+class IndicatorState:
+    def __init__(self, rsi_window=RSI_WINDOW, srsi_window=SRSI_WINDOW, ma_windows=MA_WINDOWS):
+        self.rsi_window = rsi_window
+        self.srsi_window = srsi_window
+        self.ma_windows = tuple(ma_windows)
+        self.reset()
+
+    def reset(self):
+        self.last_date = None
+        self.prev_close = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.rsi_values = deque(maxlen=self.srsi_window)
+        self.closes = deque(maxlen=max(self.ma_windows))
+        self.ma_sums = {w: 0.0 for w in self.ma_windows}
+        self.bars = 0
+
+    def _ewm(self, average, value):
+        # Same arithmetic as pandas' ewm(alpha=1/window, adjust=False)
+        alpha = 1 / self.rsi_window
+        old_weight = 1 - alpha
+        return (old_weight * average + alpha * value) / (old_weight + alpha)
+
+    def update(self, date, close):
+        close = float(close)
+
+        if self.prev_close is not None:
+            delta = close - self.prev_close
+            gain = max(delta, 0.0)
+            loss = max(-delta, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                self.avg_gain = self._ewm(self.avg_gain, gain)
+                self.avg_loss = self._ewm(self.avg_loss, loss)
+            self.rsi_values.append(_rsi_from_averages(self.avg_gain, self.avg_loss))
+
+        for window in self.ma_windows:
+            if len(self.closes) >= window:
+                self.ma_sums[window] -= self.closes[-window]
+            self.ma_sums[window] += close
+        self.closes.append(close)
+
+        self.bars += 1
+        if self.bars % MA_RESYNC_BARS == 0:
+            closes = list(self.closes)
+            for window in self.ma_windows:
+                self.ma_sums[window] = math.fsum(closes[-window:])
+
+        self.prev_close = close
+        self.last_date = date
+
+    def rsi(self):
+        return self.rsi_values[-1] if self.rsi_values else math.nan
+
+    def srsi(self):
+        if len(self.rsi_values) < self.srsi_window:
+            return math.nan
+        values = list(self.rsi_values)
+        if any(math.isnan(v) for v in values):
+            return math.nan
+        min_rsi = min(values)
+        range_rsi = max(values) - min_rsi
+        if range_rsi == 0:
+            return math.nan
+        return (values[-1] - min_rsi) / range_rsi * 100
+
+    def ma(self, window):
+        if len(self.closes) < window:
+            return math.nan
+        return self.ma_sums[window] / window
+
+    def snapshot(self):
+        latest = {
+            'Date': self.last_date,
+            'Close': self.prev_close if self.prev_close is not None else math.nan,
+            'RSI': self.rsi(),
+            'SRSI': self.srsi(),
+        }
+        for window in self.ma_windows:
+            latest[f'MA{window}'] = self.ma(window)
+        return latest
+
+    def copy(self):
+        return IndicatorState.from_dict(self.to_dict())
+
+    # Indicators as if `close` were the next bar, leaving the state as it is
+    # (e.g. for today's provisional daily bar)
+    def peek(self, date, close):
+        state = self.copy()
+        state.update(date, close)
+        return state.snapshot()
+
+    def to_dict(self):
+        return {
+            'params': [self.rsi_window, self.srsi_window, list(self.ma_windows)],
+            'last_date': self.last_date,
+            'prev_close': self.prev_close,
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss,
+            'rsi_values': list(self.rsi_values),
+            'closes': list(self.closes),
+            'ma_sums': {str(w): s for w, s in self.ma_sums.items()},
+            'bars': self.bars,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rsi_window, srsi_window, ma_windows = data['params']
+        state = cls(rsi_window, srsi_window, ma_windows)
+        state.last_date = data['last_date']
+        state.prev_close = data['prev_close']
+        state.avg_gain = data['avg_gain']
+        state.avg_loss = data['avg_loss']
+        state.rsi_values.extend(data['rsi_values'])
+        state.closes.extend(data['closes'])
+        state.ma_sums = {int(w): s for w, s in data['ma_sums'].items()}
+        state.bars = data['bars']
+        return state
+
+
+# True when `closes` (a date-indexed Close series) still contains the state's
+# last bar with the same close, so the state can continue from there.
+def can_resume(state, closes):
+    if state.last_date is None:
+        return True
+    last = pd.Timestamp(state.last_date)
+    pos = closes.index.searchsorted(last)
+    return (
+        pos < len(closes) and closes.index[pos] == last and
+        math.isclose(closes.iloc[pos], state.prev_close, rel_tol=1e-9)
+    )
+
+# Feed the bars of `closes` newer than the state's last bar.  The state is
+# rebuilt from scratch when it cannot resume (e.g. re-adjusted history).
+def update_from_bars(state, closes):
+    if not can_resume(state, closes):
+        state.reset()
+    if state.last_date is not None:
+        closes = closes[closes.index > pd.Timestamp(state.last_date)]
+
+    for date, close in zip(closes.index, closes.values):
+        state.update(date.strftime('%Y-%m-%d'), close)
+    return state
+
+
+# === Vectorized kernel over a (ticker, date) float matrix ===
+# NaN marks a day without a bar.  Each row is packed so its bars are
+# contiguous, which makes the result per ticker identical to computing it on
+# that ticker's own bars alone.
+
+def _pack(values):
+    values = np.atleast_2d(np.asarray(values, dtype='float64'))
+    order = np.argsort(~np.isnan(values), axis=1, kind='stable')
+    return np.take_along_axis(values, order, axis=1), order
+
+def _unpack(packed, order):
+    values = np.empty_like(packed)
+    np.put_along_axis(values, order, packed, axis=1)
+    return values
+
+
+def new_rsi_state(rows):
+    return dict(
+        prev_close=np.full(rows, np.nan),
+        avg_gain=np.full(rows, np.nan), avg_loss=np.full(rows, np.nan),
+        moves=np.zeros(rows), gain_sums=np.zeros(rows), loss_sums=np.zeros(rows),
+    )
+
+# Steps the RSI recursion across the columns of `close`, skipping NaN (no
+# bar) columns, and returns the RSI plus the state to resume from: passing
+# the state back with the following columns gives the same values as one
+# call over all of them.
+def rsi_stream(close, window=RSI_WINDOW, seed='first', state=None):
+    close = np.atleast_2d(np.asarray(close, dtype='float64'))
+    state = {k: v.copy() for k, v in (state or new_rsi_state(close.shape[0])).items()}
+    prev_close, avg_gain, avg_loss = state['prev_close'], state['avg_gain'], state['avg_loss']
+    moves, gain_sums, loss_sums = state['moves'], state['gain_sums'], state['loss_sums']
+
+    alpha = 1 / window
+    old_weight = 1 - alpha
+    rsi = np.full_like(close, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for t in range(close.shape[1]):
+            c = close[:, t]
+            delta = c - prev_close
+            moved = ~np.isnan(delta)
+            gain = np.clip(delta, 0, None)
+            loss = np.clip(-delta, 0, None)
+            if seed == 'sma':
+                # Wilder's original smoothing as in backtrader's RSI: seeded with the
+                # mean of the first `window` moves, no RSI before that
+                moves += moved
+                warming = moved & (moves <= window)
+                gain_sums += np.where(warming, gain, 0.0)
+                loss_sums += np.where(warming, loss, 0.0)
+                seeding = warming & (moves == window)
+                smoothing = moved & (moves > window)
+                avg_gain = np.where(seeding, gain_sums / window, np.where(smoothing, avg_gain * old_weight + gain * alpha, avg_gain))
+                avg_loss = np.where(seeding, loss_sums / window, np.where(smoothing, avg_loss * old_weight + loss * alpha, avg_loss))
+            else:
+                # Same arithmetic as pandas' ewm(alpha=1/window, adjust=False)
+                first = moved & np.isnan(avg_gain)
+                smoothing = moved & ~first
+                avg_gain = np.where(first, gain, np.where(smoothing, (old_weight * avg_gain + alpha * gain) / (old_weight + alpha), avg_gain))
+                avg_loss = np.where(first, loss, np.where(smoothing, (old_weight * avg_loss + alpha * loss) / (old_weight + alpha), avg_loss))
+            rsi[:, t] = np.where(moved, 100 - (100 / (1 + avg_gain / avg_loss)), np.nan)
+            prev_close = np.where(np.isnan(c), prev_close, c)
+
+    state.update(prev_close=prev_close, avg_gain=avg_gain, avg_loss=avg_loss)
+    return rsi, state
+
+# On packed rows seed='first' is pandas' ewm(alpha=1/window, adjust=False)
+# down each column of the (date, ticker) transpose, which runs the
+# recursion in compiled code instead of stepping rsi_stream day by day
+def _rsi_packed(close, window, seed='first'):
+    if seed != 'first':
+        return rsi_stream(close, window, seed)[0]
+    delta = np.diff(close, axis=1, prepend=np.nan)
+    gain = np.clip(delta, 0, None)
+    loss = np.clip(-delta, 0, None)
+    avg_gain = pd.DataFrame(gain.T).ewm(alpha=1 / window, adjust=False).mean().to_numpy().T
+    avg_loss = pd.DataFrame(loss.T).ewm(alpha=1 / window, adjust=False).mean().to_numpy().T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+    rsi[np.isnan(delta)] = np.nan
+    return rsi
+
+def _srsi_packed(rsi, window):
+    srsi = np.full_like(rsi, np.nan)
+    if rsi.shape[1] < window:
+        return srsi
+    windows = np.lib.stride_tricks.sliding_window_view(rsi, window, axis=1)
+    min_rsi = windows.min(axis=-1)
+    range_rsi = windows.max(axis=-1) - min_rsi
+    range_rsi[range_rsi == 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        srsi[:, window - 1:] = (rsi[:, window - 1:] - min_rsi) / range_rsi * 100
+    return srsi
+
+def _sma_packed(close, window):
+    sma = np.full_like(close, np.nan)
+    if close.shape[1] < window:
+        return sma
+    valid = ~np.isnan(close)
+    # Cumulative sums around each row's last close keep the differences precise
+    offset = np.nan_to_num(close[:, -1:])
+    sums = np.zeros((close.shape[0], close.shape[1] + 1))
+    counts = np.zeros((close.shape[0], close.shape[1] + 1))
+    np.cumsum(np.where(valid, close - offset, 0.0), axis=1, out=sums[:, 1:])
+    np.cumsum(valid, axis=1, out=counts[:, 1:])
+    window_sums = sums[:, window:] - sums[:, :-window]
+    full = (counts[:, window:] - counts[:, :-window]) == window
+    sma[:, window - 1:] = np.where(full, window_sums / window + offset, np.nan)
+    return sma
+
+
+def rsi_matrix(close, window=RSI_WINDOW, seed='first'):
+    packed, order = _pack(close)
+    return _unpack(_rsi_packed(packed, window, seed), order)
+
+def srsi_matrix(rsi, window=SRSI_WINDOW):
+    packed, order = _pack(rsi)
+    return _unpack(_srsi_packed(packed, window), order)
+
+def sma_matrix(close, window):
+    packed, order = _pack(close)
+    return _unpack(_sma_packed(packed, window), order)
+
+def compute_matrix(close, rsi_window=RSI_WINDOW, srsi_window=SRSI_WINDOW, ma_windows=MA_WINDOWS):
+    packed, order = _pack(close)
+    rsi = _rsi_packed(packed, rsi_window)
+    indicators = {
+        'RSI': _unpack(rsi, order),
+        'SRSI': _unpack(_srsi_packed(rsi, srsi_window), order),
+    }
+    for window in ma_windows:
+        indicators[f'MA{window}'] = _unpack(_sma_packed(packed, window), order)
+    return indicators
+
+
+def _bar_dates(bars):
+    index = bars.index
+    if isinstance(index, pd.MultiIndex):
+        index = index.get_level_values(-1)
+    return index
+
+def align_closes(bars_by_ticker):
+    tickers = list(bars_by_ticker)
+    closes = pd.concat(
+        [pd.Series(bars['Close'].to_numpy(), index=_bar_dates(bars)) for bars in bars_by_ticker.values()],
+        axis=1, keys=tickers
+    ).sort_index()
+    return tickers, closes.index, closes.to_numpy(dtype='float64').T
+
+# Adds RSI, SRSI, MA20 and MA50 columns to every frame in one kernel pass
+def compute_universe(bars_by_ticker):
+    bars_by_ticker = {t: bars for t, bars in bars_by_ticker.items() if bars is not None and not bars.empty}
+    if not bars_by_ticker:
+        return {}
+
+    tickers, dates, close = align_closes(bars_by_ticker)
+    indicators = compute_matrix(close)
+
+    frames = {}
+    for row, ticker in enumerate(tickers):
+        df = bars_by_ticker[ticker].copy()
+        positions = dates.get_indexer(_bar_dates(df))
+        for name, values in indicators.items():
+            df[name] = values[row, positions]
+        frames[ticker] = df
+    return frames
+
+def compute_frame(df):
+    return compute_universe({'_': df})['_']
+
+# Latest row per ticker where the close and every indicator are set, as a
+# frame indexed by ticker (what iloc[-1] after dropna() gives per frame)
+def compute_latest(bars_by_ticker):
+    bars_by_ticker = {t: bars for t, bars in bars_by_ticker.items() if bars is not None and not bars.empty}
+    columns = ['Date', 'Close', 'RSI', 'SRSI'] + [f'MA{w}' for w in MA_WINDOWS]
+    if not bars_by_ticker:
+        return pd.DataFrame(columns=columns)
+
+    tickers, dates, close = align_closes(bars_by_ticker)
+    indicators = compute_matrix(close)
+
+    complete = ~np.isnan(close)
+    for values in indicators.values():
+        complete &= ~np.isnan(values)
+    has_row = complete.any(axis=1)
+    last = close.shape[1] - 1 - np.argmax(complete[:, ::-1], axis=1)
+
+    rows = np.arange(len(tickers))
+    latest = pd.DataFrame({'Date': dates[last], 'Close': close[rows, last]}, index=pd.Index(tickers, name='Ticker'))
+    for name, values in indicators.items():
+        latest[name] = values[rows, last]
+    return latest[has_row][columns]
+
+
+def load_indicator_states(filename=INDICATOR_STATE_FILE):
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    return {ticker: IndicatorState.from_dict(state) for ticker, state in data.items()}
+
+def save_indicator_states(states, filename=INDICATOR_STATE_FILE):
+    with open(filename + ".tmp", 'w') as f:
+        json.dump({ticker: state.to_dict() for ticker, state in states.items()}, f)
+    os.replace(filename + ".tmp", filename)
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import cProfile
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Where run profiles go: <RUN_PROFILE_DIR>/<run>_profile.json
+PROFILE_DIR = os.environ.get("RUN_PROFILE_DIR", ".")
+# Set RUN_CPROFILE to a file name to also collect cProfile stats for the run
+CPROFILE_FILE = os.environ.get("RUN_CPROFILE")
+
+
+# Wall time per stage (and per ticker within a stage) and call counts, time
+# and errors per external endpoint.  Stages may nest; each one's time
+# includes whatever runs inside it.
+class RunProfile:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.perf_counter()
+            self.started_at = datetime.now(timezone.utc)
+            self.stages = {}
+            self.tickers = {}
+            self.endpoints = {}
+
+    def add_stage(self, name, seconds, ticker=None):
+        with self.lock:
+            totals = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+            if ticker is not None:
+                per_ticker = self.tickers.setdefault(ticker, {})
+                per_ticker[name] = per_ticker.get(name, 0.0) + seconds
+
+    def add_call(self, endpoint, seconds, failed=False):
+        with self.lock:
+            totals = self.endpoints.setdefault(endpoint, {'calls': 0, 'errors': 0, 'seconds': 0.0})
+            totals['calls'] += 1
+            totals['errors'] += int(failed)
+            totals['seconds'] += seconds
+
+    def to_dict(self, run):
+        with self.lock:
+            return {
+                'run': run,
+                'started_at': self.started_at.isoformat(),
+                'seconds': time.perf_counter() - self.started,
+                'stages': {name: dict(totals) for name, totals in self.stages.items()},
+                'endpoints': {name: dict(totals) for name, totals in self.endpoints.items()},
+                'tickers': {ticker: dict(stages) for ticker, stages in self.tickers.items()},
+            }
+
+profile = RunProfile()
+
+
+@contextmanager
+def stage(name, ticker=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_stage(name, time.perf_counter() - started, ticker)
+
+def timed(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Counts one call to an external endpoint, e.g. "yfinance.download"
+@contextmanager
+def api_call(endpoint):
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        profile.add_call(endpoint, time.perf_counter() - started, failed)
+
+
+# Wraps an API client so every public method call is counted as
+# "<endpoint>.<method>", e.g. "alpaca.trading.submit_order"
+class InstrumentedClient:
+    def __init__(self, client, endpoint):
+        self._client = client
+        self._endpoint = endpoint
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        endpoint = f"{self._endpoint}.{name}"
+
+        @wraps(attr)
+        def call(*args, **kwargs):
+            with api_call(endpoint):
+                return attr(*args, **kwargs)
+        return call
+
+
+def write_profile(run, directory=PROFILE_DIR):
+    filename = os.path.join(directory, f"{run}_profile.json")
+    with open(filename, 'w') as f:
+        json.dump(profile.to_dict(run), f, indent=2)
+    print(f"📝 Run profile written to {filename}")
+    return filename
+
+
+# === Profiler hook ===
+# set_profiler() takes a factory returning a context manager (e.g. a sampling
+# profiler's session); without one, RUN_CPROFILE turns on cProfile.
+
+_profiler_factory = None
+
+def set_profiler(factory):
+    global _profiler_factory
+    _profiler_factory = factory
+
+@contextmanager
+def _cprofile(filename):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filename)
+        print(f"📝 cProfile stats written to {filename}")
+
+@contextmanager
+def profiling():
+    if _profiler_factory is not None:
+        with _profiler_factory():
+            yield
+    elif CPROFILE_FILE:
+        with _cprofile(CPROFILE_FILE):
+            yield
+    else:
+        yield
@@ -0,0 +1,191 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import stage
+from alpaca.common.enums import Sort
+from alpaca.trading.requests import GetOrdersRequest, LimitOrderRequest, MarketOrderRequest
+from alpaca.trading.enums import OrderSide, OrderStatus, OrderType, QueryOrderStatus, TimeInForce
+
+DOLLARS_PER_TRADE = 100
+TAKE_PROFIT_PCT = 0.20
+ORDER_WORKERS = int(os.environ.get("ORDER_WORKERS", "8"))
+
+# Fill tracking: one get_orders call per poll for every pending entry
+FILL_POLL_INTERVAL = 2
+FILL_POLL_ATTEMPTS = 10
+
+DEAD_STATUSES = {OrderStatus.CANCELED, OrderStatus.EXPIRED, OrderStatus.REJECTED}
+ORDERS_PAGE_SIZE = 500
+
+
+def entry_order_request(ticker, dollars=DOLLARS_PER_TRADE):
+    return MarketOrderRequest(
+        symbol=ticker,
+        notional=dollars,
+        side=OrderSide.BUY,
+        type=OrderType.MARKET,
+        time_in_force=TimeInForce.DAY,
+    )
+
+def take_profit_request(ticker, qty, entry_price, take_profit_pct=TAKE_PROFIT_PCT):
+    return LimitOrderRequest(
+        symbol=ticker,
+        qty=qty,
+        limit_price=round(entry_price * (1 + take_profit_pct), 2),
+        side=OrderSide.SELL,
+        time_in_force=TimeInForce.DAY
+    )
+
+
+def submit_entries(trading_client, entries, dollars=DOLLARS_PER_TRADE, workers=ORDER_WORKERS):
+    def submit(entry):
+        ticker, _ = entry
+        try:
+            order = trading_client.submit_order(entry_order_request(ticker, dollars))
+            print(f"🛒 Buy order submitted for {ticker} (${dollars})")
+            return order
+        except Exception as e:
+            print(f"❌ Failed to execute trade for {ticker}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(entries)))) as pool:
+        return list(pool.map(submit, entries))
+
+
+def _place_take_profit(trading_client, ticker, filled_qty, entry_price, take_profit_pct):
+    request = take_profit_request(ticker, filled_qty, entry_price, take_profit_pct)
+    try:
+        trading_client.submit_order(request)
+        print(f"📈 Take Profit order placed at ${request.limit_price}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to execute trade for {ticker}: {e}")
+        return False
+
+
+# `entries` is a list of (ticker, entry price).  Every market buy goes out
+# first; then all pending orders are polled together and each take-profit
+# limit is placed as soon as its buy shows a fill.  Returns {ticker: True if
+# the buy filled and the take-profit was placed}.
+def place_entry_orders(trading_client, entries, dollars=DOLLARS_PER_TRADE, take_profit_pct=TAKE_PROFIT_PCT,
+                       poll_interval=FILL_POLL_INTERVAL, poll_attempts=FILL_POLL_ATTEMPTS,
+                       workers=ORDER_WORKERS, sleep=time.sleep):
+    results = {ticker: False for ticker, _ in entries}
+    if not entries:
+        return results
+
+    submitted_after = datetime.now(timezone.utc) - timedelta(minutes=1)
+    with stage('submit_entries'):
+        orders = submit_entries(trading_client, entries, dollars, workers)
+    pending = {
+        str(order.id): (ticker, entry_price)
+        for (ticker, entry_price), order in zip(entries, orders) if order is not None
+    }
+
+    # Time spent waiting for fills (and placing take-profits)
+    with stage('poll_fills'):
+        for attempt in range(poll_attempts):
+            if attempt:
+                sleep(poll_interval)
+            try:
+                polled = trading_client.get_orders(GetOrdersRequest(
+                    status=QueryOrderStatus.ALL,
+                    symbols=sorted({ticker for ticker, _ in pending.values()}),
+                    after=submitted_after,
+                    limit=ORDERS_PAGE_SIZE,
+                ))
+            except Exception as e:
+                print(f"⚠️ Failed to poll order status: {e}")
+                continue
+
+            for order in polled:
+                order_id = str(order.id)
+                if order_id not in pending:
+                    continue
+                ticker, entry_price = pending[order_id]
+                if order.filled_qty and float(order.filled_qty) > 0:
+                    filled_qty = float(order.filled_qty)
+                    print(f"✅ Order filled: {filled_qty} shares of {ticker}")
+                    results[ticker] = _place_take_profit(trading_client, ticker, filled_qty, entry_price, take_profit_pct)
+                    del pending[order_id]
+                elif order.status in DEAD_STATUSES:
+                    print(f"❌ Buy order for {ticker} ended {order.status.value} without a fill")
+                    del pending[order_id]
+
+            if not pending:
+                break
+
+    for ticker, _ in pending.values():
+        print(f"⚠️ Order not filled in time for {ticker}")
+    return results
+
+
+# === Reconciliation queries ===
+
+# Every order matching `filters` submitted after `after`, oldest first,
+# paging through get_orders' result limit
+def fetch_orders_after(trading_client, after=None, **filters):
+    orders = {}
+    while True:
+        page = trading_client.get_orders(GetOrdersRequest(
+            after=after, direction=Sort.ASC, limit=ORDERS_PAGE_SIZE, **filters
+        ))
+        for order in page:
+            orders[str(order.id)] = order
+        if len(page) < ORDERS_PAGE_SIZE:
+            return list(orders.values())
+        after = page[-1].submitted_at
+
+# {symbol: latest filled SELL order} for `symbols`, submitted after `after`
+def filled_sells_by_symbol(trading_client, symbols, after=None):
+    sells = {}
+    if not symbols:
+        return sells
+    for order in fetch_orders_after(trading_client, after, status=QueryOrderStatus.CLOSED,
+                                    side=OrderSide.SELL, symbols=sorted(symbols)):
+        if order.filled_at is None:
+            continue
+        current = sells.get(order.symbol)
+        if current is None or order.filled_at > current.filled_at:
+            sells[order.symbol] = order
+    return sells
+
+# Where the next reconciliation can start: orders submitted before the
+# earliest still-open SELL for `symbols` can no longer fill, so nothing
+# before it (or before `now` when none is open) needs querying again.
+# Stepped back a second since get_orders' `after` is exclusive.
+def next_sync_mark(trading_client, symbols, now):
+    if not symbols:
+        return now - timedelta(seconds=1)
+    open_orders = trading_client.get_orders(GetOrdersRequest(
+        status=QueryOrderStatus.OPEN, side=OrderSide.SELL, symbols=sorted(symbols), limit=ORDERS_PAGE_SIZE
+    ))
+    submitted = [order.submitted_at for order in open_orders if order.submitted_at is not None]
+    return min(submitted + [now]) - timedelta(seconds=1)
+
+
+# Cancels every open order for `symbols` with one lookup and bounded
+# parallel cancels.  Returns the (symbol, order id, error) of each failure.
+def cancel_open_orders(trading_client, symbols, workers=ORDER_WORKERS):
+    if not symbols:
+        return []
+    try:
+        open_orders = fetch_orders_after(trading_client, status=QueryOrderStatus.OPEN, symbols=sorted(symbols))
+    except Exception as e:
+        print(f"❌ Failed to list open orders for {', '.join(sorted(symbols))}: {e}")
+        return [(symbol, None, e) for symbol in sorted(symbols)]
+    if not open_orders:
+        return []
+
+    def cancel(order):
+        try:
+            trading_client.cancel_order_by_id(order.id)
+            print(f"🚫 Canceled open order for {order.symbol} (ID: {order.id})")
+            return None
+        except Exception as e:
+            print(f"❌ Failed to cancel order for {order.symbol} (ID: {order.id}): {e}")
+            return (order.symbol, order.id, e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(open_orders)))) as pool:
+        return [failure for failure in pool.map(cancel, open_orders) if failure is not None]
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import pandas as pd
+from contextlib import contextmanager
+
+POSITIONS_DB = os.environ.get("POSITIONS_DB", "positions.db")
+POSITIONS_CSV = "positions.csv"
+POSITION_COLUMNS = ['ticker', 'date', 'close', 'entry_rsi', 'srsi', 'ma20', 'status', 'sell_price', 'gain_loss']
+
+# Dates are stored as ISO 8601 UTC text; bar dates without a zone are New
+# York trading days (see bar_store.normalize_bars)
+MARKET_TZ = 'America/New_York'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    date TEXT,
+    close REAL,
+    entry_rsi REAL,
+    srsi REAL,
+    ma20 REAL,
+    status TEXT NOT NULL DEFAULT 'open',
+    sell_price REAL,
+    gain_loss REAL,
+    closed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS positions_ticker_status ON positions (ticker, status);
+"""
+
+
+def to_utc(value):
+    if value is None or pd.isna(value):
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is None:
+        timestamp = timestamp.tz_localize(MARKET_TZ)
+    return timestamp.tz_convert('UTC').isoformat()
+
+def _float(value):
+    return None if value is None or pd.isna(value) else float(value)
+
+
+def connect(db=POSITIONS_DB, csv_file=POSITIONS_CSV):
+    created = not os.path.exists(db)
+    conn = sqlite3.connect(db)
+    conn.executescript(SCHEMA)
+    if created and csv_file and os.path.exists(csv_file):
+        import_csv(conn, csv_file)
+    return conn
+
+
+# One connection per operation, committed on success and always closed
+@contextmanager
+def _transaction(db):
+    conn = connect(db)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _row_values(info):
+    return (
+        info['ticker'], to_utc(info.get('date')), _float(info.get('close')),
+        _float(info.get('entry_rsi')), _float(info.get('srsi')), _float(info.get('ma20')),
+        info.get('status') if isinstance(info.get('status'), str) else 'open',
+        _float(info.get('sell_price')), _float(info.get('gain_loss')),
+    )
+
+INSERT_SQL = (
+    "INSERT INTO positions (ticker, date, close, entry_rsi, srsi, ma20, status, sell_price, gain_loss) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+def import_csv(conn, csv_file=POSITIONS_CSV):
+    df = pd.read_csv(csv_file, dtype={'date': str})
+    with conn:
+        conn.executemany(INSERT_SQL, [_row_values(row) for row in df.to_dict('records')])
+    print(f"🗄️ Imported {len(df)} positions from {csv_file}")
+
+
+def load_positions(db=POSITIONS_DB, status=None):
+    with _transaction(db) as conn:
+        query = f"SELECT {', '.join(POSITION_COLUMNS)} FROM positions"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        df = pd.read_sql_query(query + " ORDER BY id", conn, params=params)
+    df['date'] = pd.to_datetime(df['date'], utc=True, format='ISO8601')
+    return df
+
+def open_positions(db=POSITIONS_DB):
+    return load_positions(db, status='open')
+
+
+def add_position(info, db=POSITIONS_DB):
+    with _transaction(db) as conn:
+        conn.execute(INSERT_SQL, _row_values({**info, 'status': 'open'}))
+
+# Closes every open row for `ticker` in one transaction; returns the count
+def close_position(ticker, sell_price, gain_loss, db=POSITIONS_DB):
+    with _transaction(db) as conn:
+        cursor = conn.execute(
+            "UPDATE positions SET status = 'closed', sell_price = ?, gain_loss = ?, closed_at = ? "
+            "WHERE ticker = ? AND status = 'open'",
+            (float(sell_price), float(gain_loss), pd.Timestamp.now(tz='UTC').isoformat(), ticker)
+        )
+        return cursor.rowcount
+
+
+def export_csv(filename=POSITIONS_CSV, db=POSITIONS_DB):
+    df = load_positions(db)
+    df.to_csv(filename + ".tmp", index=False)
+    os.replace(filename + ".tmp", filename)
@@ -0,0 +1,467 @@
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import random
+import shutil
+import logging
+import smtplib
+import argparse
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from types import ModuleType, SimpleNamespace
+from datetime import datetime, timezone
+
+# Offline replay of a daily run: bot.py or analyze.py runs unchanged against
+# local stand-ins for Alpaca's data and trading clients, yfinance and SMTP,
+# serving recorded (bar store) or synthetic bars up to an as-of date.
+#
+#   python replay.py bot --as-of 2025-06-24 --tickers 5000 --latency 0.05
+#   python replay.py analyze --bars-dir bar_data --source yfinance --as-of 2025-06-24
+#
+# Each run writes decisions.json (orders, positions, opportunities, state
+# files); --expect compares it with an earlier run's.  Injected errors are
+# rate limits (HTTP 429) that the request scheduler retries, so decisions
+# are reproduced exactly unless a call fails on every attempt.  Requests are
+# not throttled unless --throttle is given.
+
+DECISIONS_FILE = "decisions.json"
+SYNTHETIC_YEARS = 2
+# Rate limit (per second, burst) standing in for the real ones without --throttle
+UNTHROTTLED = (1e6, 1e6)
+
+
+class ReplayError(Exception):
+    pass
+
+class RateLimitError(ReplayError):
+    status_code = 429
+
+
+# Sleeps `latency` (+ up to `jitter`) seconds per call and fails a fraction
+# `error_rate` of calls, from a seeded generator
+class FaultInjector:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def call(self, endpoint, error=RateLimitError):
+        with self.lock:
+            delay = self.latency + self.jitter * self.random.random()
+            fail = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise error(f"injected failure in {endpoint}")
+
+
+# === Bars ===
+
+def recorded_bars(store_dir, source):
+    from bar_store import load_bars, load_manifest
+    bars_by_ticker = {}
+    for ticker in load_manifest(source, store_dir):
+        bars = load_bars(ticker, source, store_dir=store_dir)
+        if bars is not None and not bars.empty:
+            bars_by_ticker[ticker] = bars
+    return bars_by_ticker
+
+def synthetic_universe(tickers, as_of, years=SYNTHETIC_YEARS, seed=0):
+    from benchmark import synthetic_bars
+    return synthetic_bars(tickers, years, seed, end=as_of)
+
+def _day(value):
+    value = pd.Timestamp(value)
+    if value.tz is not None:
+        value = value.tz_convert('America/New_York').tz_localize(None)
+    return value.normalize()
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tz is None else value.tz_convert('UTC')
+
+
+# Bars by ticker up to and including the as-of day, with the lookups the
+# fakes need
+class Market:
+    def __init__(self, bars_by_ticker, as_of):
+        self.as_of = _day(as_of)
+        self.bars = {ticker: bars[bars.index <= self.as_of] for ticker, bars in bars_by_ticker.items()}
+
+    def window(self, ticker, start=None, end=None, end_inclusive=True):
+        bars = self.bars.get(ticker)
+        if bars is None:
+            return None
+        mask = np.ones(len(bars), dtype=bool)
+        if start is not None:
+            mask &= bars.index >= _day(start)
+        if end is not None:
+            mask &= (bars.index <= _day(end)) if end_inclusive else (bars.index < _day(end))
+        return bars[mask]
+
+    def last_price(self, ticker):
+        bars = self.bars.get(ticker)
+        if bars is None or bars.empty:
+            raise ReplayError(f"no bars for {ticker}")
+        return float(bars['Close'].iloc[-1])
+
+
+# === Alpaca ===
+
+class FakeDataClient:
+    def __init__(self, market, faults=None):
+        self.market = market
+        self.faults = faults or FaultInjector()
+
+    def get_stock_bars(self, request):
+        self.faults.call('alpaca.data.get_stock_bars')
+        symbols = request.symbol_or_symbols
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+
+        # alpaca-py sends naive start/end (e.g. end='2025-06-24') as UTC and
+        # the end is exclusive; daily bars are stamped at midnight New York
+        # time (04:00/05:00 UTC), so end=<as-of day> stops at the day before
+        start = None if request.start is None else _utc(request.start)
+        end = None if request.end is None else _utc(request.end)
+
+        frames = []
+        for symbol in symbols:
+            bars = self.market.bars.get(symbol)
+            if bars is None:
+                continue
+            timestamps = bars.index.tz_localize('America/New_York').tz_convert('UTC')
+            mask = np.ones(len(bars), dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps < end
+            bars, timestamps = bars[mask], timestamps[mask]
+            if bars.empty:
+                continue
+            frames.append(pd.DataFrame({
+                'open': bars['Open'].to_numpy(), 'high': bars['High'].to_numpy(),
+                'low': bars['Low'].to_numpy(), 'close': bars['Close'].to_numpy(),
+                'volume': bars['Volume'].to_numpy(),
+            }, index=pd.MultiIndex.from_arrays([[symbol] * len(bars), timestamps], names=['symbol', 'timestamp'])))
+        return SimpleNamespace(df=pd.concat(frames) if frames else pd.DataFrame())
+
+
+OPEN_STATUSES = {'new', 'accepted', 'pending_new', 'partially_filled', 'held', 'accepted_for_bidding', 'pending_cancel', 'pending_replace'}
+
+def _order(order_id, **fields):
+    from alpaca.trading.enums import OrderStatus, OrderSide
+    order = SimpleNamespace(
+        id=order_id, symbol=None, side=None, type='market', qty=None, notional=None, limit_price=None,
+        status='new', filled_qty='0', filled_avg_price=None, submitted_at=None, filled_at=None,
+    )
+    for name, value in fields.items():
+        setattr(order, name, value)
+    order.status = OrderStatus(getattr(order.status, 'value', order.status))
+    order.side = OrderSide(getattr(order.side, 'value', order.side))
+    for name in ('submitted_at', 'filled_at'):
+        value = getattr(order, name)
+        if isinstance(value, str):
+            setattr(order, name, datetime.fromisoformat(value))
+    return order
+
+
+# Market orders fill at once at the as-of close; limit orders rest open.
+# `orders` preloads history, e.g. filled take-profits for the sync to find.
+class FakeTradingClient:
+    def __init__(self, market, orders=(), faults=None, cash=100_000.0):
+        self.market = market
+        self.faults = faults or FaultInjector()
+        self.cash = cash
+        self.lock = threading.Lock()
+        self.ids = 0
+        self.orders = [_order(self._next_id(), **fields) for fields in orders]
+        self.submitted = []
+
+    def _next_id(self):
+        self.ids += 1
+        return uuid.UUID(int=self.ids)
+
+    def submit_order(self, request):
+        self.faults.call('alpaca.trading.submit_order')
+        now = datetime.now(timezone.utc)
+        kind = getattr(request.type, 'value', request.type)
+        fields = dict(
+            symbol=request.symbol, side=request.side, type=kind, qty=request.qty, notional=request.notional,
+            limit_price=getattr(request, 'limit_price', None), submitted_at=now,
+        )
+        if kind == 'market':
+            price = self.market.last_price(request.symbol)
+            qty = float(request.qty) if request.qty is not None else round(float(request.notional) / price, 9)
+            fields.update(status='filled', filled_qty=str(qty), filled_avg_price=str(price), filled_at=now)
+        with self.lock:
+            if kind == 'market':
+                self.cash += qty * price * (-1 if getattr(request.side, 'value', request.side) == 'buy' else 1)
+            order = _order(self._next_id(), **fields)
+            self.orders.append(order)
+            self.submitted.append(order)
+        return order
+
+    def get_orders(self, filter=None):
+        self.faults.call('alpaca.trading.get_orders')
+        with self.lock:
+            orders = list(self.orders)
+        if filter is None:
+            return [o for o in orders if o.status.value in OPEN_STATUSES]
+
+        status = getattr(filter.status, 'value', filter.status) or 'open'
+        if status != 'all':
+            orders = [o for o in orders if (o.status.value in OPEN_STATUSES) == (status == 'open')]
+        if filter.side is not None:
+            orders = [o for o in orders if o.side == filter.side]
+        if filter.symbols:
+            symbols = set(filter.symbols)
+            orders = [o for o in orders if o.symbol in symbols]
+        if filter.after is not None:
+            orders = [o for o in orders if o.submitted_at > filter.after]
+        if filter.until is not None:
+            orders = [o for o in orders if o.submitted_at < filter.until]
+
+        ascending = getattr(filter.direction, 'value', filter.direction) == 'asc'
+        orders.sort(key=lambda o: o.submitted_at, reverse=not ascending)
+        return orders[:filter.limit or 50]
+
+    def cancel_order_by_id(self, order_id):
+        self.faults.call('alpaca.trading.cancel_order_by_id')
+        from alpaca.trading.enums import OrderStatus
+        with self.lock:
+            for order in self.orders:
+                if str(order.id) == str(order_id) and order.status.value in OPEN_STATUSES:
+                    order.status = OrderStatus.CANCELED
+                    return
+        raise ReplayError(f"order {order_id} is not open")
+
+    def get_account(self):
+        self.faults.call('alpaca.trading.get_account')
+        return SimpleNamespace(cash=str(self.cash), buying_power=str(self.cash), status='ACTIVE')
+
+
+# === yfinance ===
+
+# Stands in for the yfinance module: download() with end exclusive and
+# group_by='ticker' columns, Ticker().fast_info / .info
+def fake_yfinance(market, faults=None):
+    faults = faults or FaultInjector()
+    module = ModuleType('yfinance')
+
+    # Like the real one, a failure for one symbol just leaves it out and is
+    # logged as "['SYM', ...]: <error>"
+    def download(tickers, start=None, end=None, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {}
+        errors = {}
+        for ticker in tickers:
+            try:
+                faults.call('yfinance.download')
+            except ReplayError as e:
+                errors.setdefault(repr(e), []).append(ticker.upper())
+                continue
+            bars = market.window(ticker, start, end, end_inclusive=False)
+            if bars is not None and not bars.empty:
+                frames[ticker] = bars[['Open', 'High', 'Low', 'Close', 'Volume']]
+            else:
+                errors.setdefault('possibly delisted; no price data found', []).append(ticker.upper())
+        for error, symbols in errors.items():
+            logging.getLogger('yfinance').error(f'{symbols}: ' + error)
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1)
+        data.index.name = 'Date'
+        return data
+
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        @property
+        def fast_info(self):
+            faults.call('yfinance.fast_info')
+            return {'last_price': market.last_price(self.ticker)}
+
+        @property
+        def info(self):
+            faults.call('yfinance.info')
+            # Stable across runs (unlike hash())
+            return {'trailingPE': 5 + zlib.crc32(self.ticker.encode()) % 4500 / 100}
+
+    module.download = download
+    module.Ticker = Ticker
+    return module
+
+
+# === SMTP ===
+
+class FakeSMTP:
+    def __init__(self, inbox, faults=None):
+        self.inbox = inbox
+        self.faults = faults or FaultInjector()
+        self.faults.call('smtp.connect', error=ConnectionRefusedError)
+
+    def send_message(self, msg):
+        self.faults.call('smtp.send_message', error=smtplib.SMTPServerDisconnected)
+        self.inbox.append(msg)
+
+    def quit(self):
+        pass
+
+
+# === Runs ===
+
+# Installs the fakes into bot/analyze and the modules they import lazily;
+# `tickers` becomes the universe (written to universe.txt in the cwd)
+def install(market, orders=(), faults=None, tickers=None, throttle=False):
+    import bot
+    import email_sender
+    import scheduler
+    from scheduler import DATA, ORDERS
+
+    trading = FakeTradingClient(market, orders, faults)
+    bot._clients['data'] = bot.scheduled_client(FakeDataClient(market, faults), 'alpaca.data', DATA, coalesce=True)
+    bot._clients['trading'] = bot.scheduled_client(trading, 'alpaca.trading', ORDERS)
+    sys.modules['yfinance'] = fake_yfinance(market, faults)
+    if not throttle:
+        scheduler.scheduler = scheduler.Scheduler(
+            rate_limits={provider: UNTHROTTLED for provider in scheduler.RATE_LIMITS},
+            backoff_base=0.01, backoff_max=0.1, seed=0
+        )
+
+    inbox = []
+    email_sender._outbox.connect = lambda: FakeSMTP(inbox, faults)
+    email_sender._outbox.sleep = lambda seconds: None
+
+    if tickers is not None:
+        with open("universe.txt", 'w') as f:
+            f.write("\n".join(tickers) + "\n")
+        os.environ["UNIVERSE"] = os.path.abspath("universe.txt")
+    return SimpleNamespace(trading=trading, inbox=inbox)
+
+
+def _records(df):
+    df = df.copy()
+    for name in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[name]):
+            df[name] = df[name].dt.strftime('%Y-%m-%d')
+    return json.loads(df.to_json(orient='records', double_precision=15))
+
+def _load_json(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+# What a run decided, minus wall-clock fields (order ids and times, report
+# timestamps) so that two replays of the same day compare equal.  The bar
+# store's coverage shows tickers whose bars failed to download.
+def decisions(run, fakes):
+    import positions_store
+    from bar_store import load_manifest
+    from trade_journal import query_opportunities
+
+    orders = sorted(
+        (
+            {'symbol': o.symbol, 'side': o.side.value, 'type': o.type, 'notional': o.notional,
+             'qty': o.qty, 'limit_price': o.limit_price, 'status': o.status.value}
+            for o in fakes.trading.submitted
+        ),
+        key=lambda o: (o['symbol'], o['side'], o['type'])
+    )
+    result = {
+        'run': run, 'orders': orders, 'emails': len(fakes.inbox),
+        'bars': load_manifest('alpaca' if run == 'bot' else 'yfinance'),
+    }
+    if run == 'bot':
+        result['positions'] = _records(positions_store.load_positions())
+    else:
+        result['opportunities'] = _records(query_opportunities().drop(columns=['Date']))
+        result['rsi_state'] = _load_json("rsi_state.json")
+        result['rsi_buy_signals'] = _load_json("rsi_buy_signals.json")
+    return result
+
+
+def replay(run, market, workdir, orders=(), faults=None, tickers=None, positions_file=None, throttle=False):
+    os.makedirs(workdir, exist_ok=True)
+    if positions_file:
+        shutil.copy(positions_file, os.path.join(workdir, "positions.csv"))
+    os.chdir(workdir)
+
+    os.environ["AS_OF_DATE"] = market.as_of.strftime('%Y-%m-%d')
+    for name in ("API_KEY_PAPER", "SECRET_KEY_PAPER", "EMAIL_ADDRESS", "EMAIL_PASSWORD", "EMAIL_RECIPIENT"):
+        os.environ[name] = "replay@localhost" if name.startswith("EMAIL") else "replay"
+
+    fakes = install(market, orders, faults, tickers, throttle)
+    if run == 'bot':
+        import bot
+        bot.main()
+    else:
+        import analyze
+        analyze.main()
+
+    result = decisions(run, fakes)
+    with open(DECISIONS_FILE, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"🎞️ Replay of {run} as of {os.environ['AS_OF_DATE']} written to {os.path.join(workdir, DECISIONS_FILE)}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a daily run offline against fake Alpaca, yfinance and SMTP")
+    parser.add_argument('run', choices=['bot', 'analyze'])
+    parser.add_argument('--as-of', required=True, help="trading day to replay (YYYY-MM-DD)")
+    parser.add_argument('--bars-dir', help="recorded bar store to serve; synthetic bars when omitted")
+    parser.add_argument('--source', default='alpaca', help="bar store source under --bars-dir")
+    parser.add_argument('--tickers', type=int, default=50, help="synthetic universe size")
+    parser.add_argument('--years', type=int, default=SYNTHETIC_YEARS, help="synthetic history length")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--positions', help="positions.csv to start from")
+    parser.add_argument('--orders', help="JSON list of orders already at the broker")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every fake call")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of fake calls that are rate limited")
+    parser.add_argument('--throttle', action='store_true', help="keep the real per-provider request rate limits")
+    parser.add_argument('--workdir', help="directory the run writes to (default: a new temp dir)")
+    parser.add_argument('--expect', help="decisions.json of an earlier run that this one must match")
+    args = parser.parse_args(argv)
+
+    for name in ('bars_dir', 'positions', 'orders', 'expect', 'workdir'):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    if args.bars_dir:
+        market = Market(recorded_bars(args.bars_dir, args.source), args.as_of)
+        tickers = None
+    else:
+        market = Market(synthetic_universe(args.tickers, args.as_of, args.years, args.seed), args.as_of)
+        tickers = list(market.bars)
+
+    orders = ()
+    if args.orders:
+        with open(args.orders, 'r') as f:
+            orders = json.load(f)
+
+    faults = FaultInjector(args.latency, args.jitter, args.error_rate, args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix=f"replay-{args.run}-")
+    result = replay(args.run, market, workdir, orders, faults, tickers, args.positions, args.throttle)
+
+    if args.expect:
+        expected = _load_json(args.expect)
+        different = sorted(key for key in set(expected) | set(result) if expected.get(key) != result.get(key))
+        if different:
+            print(f"❌ Decisions differ from {args.expect}: {', '.join(different)}")
+            return 1
+        print(f"✅ Decisions match {args.expect}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Priority lanes: a lower number gets the next token first, so order traffic
+# is never stuck behind a queue of data requests
+ORDERS = 0
+DATA = 1
+
+# (requests per second, burst) per provider.  Alpaca allows 200 requests a
+# minute per account across data and trading; yfinance has no published
+# limit, so a 429 from it also pauses the provider (see Scheduler.call).
+RATE_LIMITS = {
+    'alpaca': (float(os.environ.get("ALPACA_REQUESTS_PER_MINUTE", "200")) / 60, 10),
+    'yfinance': (float(os.environ.get("YFINANCE_REQUESTS_PER_MINUTE", "300")) / 60, 10),
+}
+DEFAULT_RATE_LIMIT = (10.0, 10)
+
+MAX_ATTEMPTS = int(os.environ.get("REQUEST_ATTEMPTS", "5"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def status_code(error):
+    for source in (error, getattr(error, 'response', None)):
+        code = getattr(source, 'status_code', None)
+        if isinstance(code, int):
+            return code
+    return None
+
+def rate_limited(error):
+    text = str(error).lower()
+    return (
+        status_code(error) == 429 or 'ratelimit' in type(error).__name__.lower()
+        or 'too many requests' in text or 'rate limit' in text
+    )
+
+# Failures worth another attempt: rate limits, server errors and network
+# errors (requests' exceptions are OSErrors)
+def retryable(error):
+    return rate_limited(error) or status_code(error) in RETRY_STATUSES or isinstance(error, (OSError, TimeoutError))
+
+def retry_after(error):
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+# Token bucket whose waiters are served in (priority, arrival) order
+class TokenBucket:
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.arrivals = itertools.count()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Takes `cost` tokens, e.g. one per symbol of a multi-symbol request.  A
+    # cost above the burst waits for a full bucket and leaves it in debt.
+    def acquire(self, priority=DATA, cost=1):
+        need = min(cost, self.burst)
+        with self.condition:
+            ticket = (priority, next(self.arrivals))
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    first = self.waiting[0] == ticket
+                    if first and now >= self.paused_until and self.tokens >= need:
+                        self.tokens -= cost
+                        heapq.heappop(self.waiting)
+                        self.condition.notify_all()
+                        return
+                    timeout = None
+                    if first:
+                        timeout = max(self.paused_until - now, (need - self.tokens) / self.rate, 0.001)
+                    self.condition.wait(timeout)
+            except BaseException:
+                if ticket in self.waiting:
+                    self.waiting.remove(ticket)
+                    heapq.heapify(self.waiting)
+                    self.condition.notify_all()
+                raise
+
+    # Holds every request to this provider back, e.g. after a 429
+    def pause(self, seconds):
+        with self.condition:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+            self.tokens = 0.0
+            self.condition.notify_all()
+
+
+# Runs requests within each provider's rate limit, retrying retryable
+# failures with full-jitter exponential backoff.  Calls sharing a `key`
+# while one is in flight wait for that one and get its result.  `cost` is
+# the number of tokens per attempt, or a function returning it.
+class Scheduler:
+    def __init__(self, rate_limits=None, attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE,
+                 backoff_max=BACKOFF_MAX, sleep=time.sleep, seed=None):
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.attempts = attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.buckets = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, provider):
+        with self.lock:
+            if provider not in self.buckets:
+                self.buckets[provider] = TokenBucket(*self.rate_limits.get(provider, DEFAULT_RATE_LIMIT))
+            return self.buckets[provider]
+
+    def call(self, provider, func, *args, priority=DATA, key=None, retry_if=retryable, cost=1, **kwargs):
+        if key is None:
+            return self._run(provider, func, args, kwargs, priority, retry_if, cost)
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self.in_flight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._run(provider, func, args, kwargs, priority, retry_if, cost)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def _run(self, provider, func, args, kwargs, priority, retry_if, cost):
+        bucket = self.bucket(provider)
+        for attempt in range(self.attempts):
+            bucket.acquire(priority, cost() if callable(cost) else cost)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if attempt + 1 == self.attempts or not retry_if(e):
+                    raise
+                with self.lock:
+                    delay = self.random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if rate_limited(e):
+                    delay = max(delay, retry_after(e) or 0.0)
+                    bucket.pause(delay)
+                print(f"⏳ {provider} request failed ({e}); retry {attempt + 1} in {delay:.1f}s")
+                self.sleep(delay)
+
+
+# Wraps an API client so every public method call goes through the
+# scheduler.  Calls whose name starts with one of `unsafe` (e.g. submit_)
+# may have taken effect when they fail, so only rate-limit rejections of
+# those are retried; `coalesce` shares duplicate in-flight calls.
+class ScheduledClient:
+    def __init__(self, client, provider, priority=DATA, scheduler=None, coalesce=False, unsafe=('submit_', 'replace_')):
+        self._client = client
+        self._provider = provider
+        self._priority = priority
+        self._scheduler = scheduler
+        self._coalesce = coalesce
+        self._unsafe = tuple(unsafe)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        retry_if = rate_limited if name.startswith(self._unsafe) else retryable
+
+        def call(*args, **kwargs):
+            key = (self._provider, name, repr(args), repr(sorted(kwargs.items()))) if self._coalesce else None
+            return (self._scheduler or scheduler).call(
+                self._provider, attr, *args, priority=self._priority, key=key, retry_if=retry_if, **kwargs
+            )
+        return call
+
+
+scheduler = Scheduler()
+
+def request(provider, func, *args, priority=DATA, key=None, cost=1, **kwargs):
+    return scheduler.call(provider, func, *args, priority=priority, key=key, cost=cost, **kwargs)
@@ -0,0 +1,115 @@
+import pandas as pd
+import numpy as np
+
+# === Trading bot rules (bot.check_buy_signal / check_sell_signal) ===
+BUY_RSI_MAX = 30
+BUY_SRSI_MAX = 30
+SELL_RSI_MIN = 70
+SELL_SRSI_MIN = 80
+SELL_RSI_JUMP = 42
+SELL_PRICE_VS_MA20 = 12
+SELL_PRICE_VS_MA50 = 10
+
+# Sell reason codes, combined as bit flags in the 'sell_reasons' column
+REASON_RSI = 1
+REASON_SRSI = 2
+REASON_RSI_JUMP = 4
+REASON_MA20 = 8
+REASON_MA50 = 16
+
+SELL_REASON_LABELS = [
+    (REASON_RSI, "RSI > 70"),
+    (REASON_SRSI, "SRSI > 80"),
+    (REASON_RSI_JUMP, "RSI Jump > 42"),
+    (REASON_MA20, "Price > MA20"),
+    (REASON_MA50, "Price > MA50"),
+]
+
+
+def reason_labels(flags):
+    return [label for flag, label in SELL_REASON_LABELS if int(flags) & flag]
+
+
+# `latest` is indexed by ticker with Close, RSI, SRSI, MA20 and MA50 columns
+# (see indicators.compute_latest); `entry_rsi` maps ticker -> RSI at entry.
+# Returns `latest` plus buy/sell masks, sell reason flags and the inputs the
+# exit rules use, for every ticker in one pass.
+def evaluate_signals(latest, entry_rsi=None):
+    signals = latest.copy()
+    close = signals['Close']
+    rsi = signals['RSI']
+    srsi = signals['SRSI']
+    ma20 = signals['MA20']
+    ma50 = signals['MA50']
+
+    entry = pd.Series(entry_rsi or {}, dtype='float64').reindex(signals.index)
+    signals['rsi_jump'] = rsi - entry
+    signals['price_vs_ma20'] = (close - ma20) / ma20 * 100
+    signals['price_vs_ma50'] = (close - ma50) / ma50 * 100
+
+    signals['buy'] = (rsi < BUY_RSI_MAX) & (srsi < BUY_SRSI_MAX) & (close < ma20)
+
+    flags = np.zeros(len(signals), dtype='int64')
+    flags |= np.where(rsi > SELL_RSI_MIN, REASON_RSI, 0)
+    flags |= np.where(srsi > SELL_SRSI_MIN, REASON_SRSI, 0)
+    flags |= np.where(signals['rsi_jump'] > SELL_RSI_JUMP, REASON_RSI_JUMP, 0)
+    flags |= np.where(signals['price_vs_ma20'] > SELL_PRICE_VS_MA20, REASON_MA20, 0)
+    flags |= np.where(signals['price_vs_ma50'] > SELL_PRICE_VS_MA50, REASON_MA50, 0)
+    signals['sell_reasons'] = flags
+    signals['sell'] = flags != 0
+    return signals
+
+
+# === Daily report rules (analyze.analyze_entry / analyze_exit) ===
+
+# `metrics` is indexed by ticker with RSI, SRSI, Price_vs_MA20(%),
+# Price_vs_MA50(%) and PE_Ratio columns; `previous_rsi` maps ticker -> RSI
+# recorded at the buy.  Returns Recommendation and Sell_Signal columns with
+# the same texts analyze_entry / analyze_exit produce.
+def evaluate_report(metrics, previous_rsi=None, html_format=True):
+    rsi = metrics['RSI'].astype('float64')
+    srsi = metrics['SRSI'].astype('float64')
+    vs_ma20 = metrics['Price_vs_MA20(%)'].astype('float64')
+    vs_ma50 = metrics['Price_vs_MA50(%)'].astype('float64')
+    pe = pd.to_numeric(metrics['PE_Ratio'], errors='coerce')
+
+    base = pd.Series(np.select(
+        [
+            (rsi < 30) & (srsi < 30) & (vs_ma20 < 0),
+            (rsi < 35) & (srsi < 40) & (vs_ma20 < 0),
+            (rsi > 70) | (srsi > 80),
+            (rsi >= 35) & (rsi <= 50),
+        ],
+        ["🔥 Strong Buy", "✅ Buy", "⚠️ Overbought — Consider Selling", "🤔 Watch (Neutral)"],
+        default="Hold"
+    ), index=metrics.index)
+
+    separator = "<br>" if html_format else "\n"
+    notes = [
+        ((vs_ma20 < -5) | (vs_ma50 < -5), "📉 Price below MA — possible undervaluation"),
+        ((vs_ma20 > 5) | (vs_ma50 > 5), "📈 Price above MA — watch for overbought"),
+        ((pe != 0) & (pe < 15), "💰 Low P/E — undervalued?"),
+        ((pe != 0) & (pe > 30), "🧨 High P/E — priced for perfection"),
+    ]
+    recommendation = base
+    for mask, note in notes:
+        recommendation = recommendation.where(~mask, recommendation + separator + note)
+
+    previous = pd.Series(previous_rsi or {}, dtype='float64').reindex(metrics.index)
+    sell_signal = pd.Series(np.select(
+        [
+            (rsi - previous) > 42,
+            rsi > 70,
+            vs_ma20 > 12,
+            vs_ma50 > 10,
+        ],
+        [
+            "🔻 Sell — RSI Jump > 42",
+            "🔻 Sell — RSI Overbought",
+            "🔻 Sell — Price above MA20",
+            "🔻 Sell — Price above MA50",
+        ],
+        default=None
+    ), index=metrics.index, dtype='object')
+
+    return pd.DataFrame({'Recommendation': recommendation, 'Sell_Signal': sell_signal}, dtype='object')
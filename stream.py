@@ -0,0 +1,145 @@
+import os
+import asyncio
+import threading
+import pandas as pd
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+from signals import evaluate_signals
+
+MARKET_TZ = 'America/New_York'
+ACTION_WORKERS = int(os.environ.get("STREAM_ACTION_WORKERS", "4"))
+
+
+def trading_day(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_convert(MARKET_TZ)
+    return timestamp.strftime('%Y-%m-%d')
+
+
+# Evaluates the bot's buy/sell rules on every bar from a stream.  Each
+# symbol's IndicatorState holds its completed daily bars; the latest price is
+# today's provisional daily close (IndicatorState.peek) and is folded into the
+# state once the first bar of the next day arrives.  Buy and sell actions run
+# on a thread pool so the stream keeps being read while orders go out; a
+# symbol's actions run in the order they fired (a sell waits for the buy).
+class SignalDaemon:
+    def __init__(self, states, on_buy, on_sell, held=(), entry_rsi=None, workers=ACTION_WORKERS):
+        self.states = states
+        self.on_buy = on_buy
+        self.on_sell = on_sell
+        self.held = set(held)
+        self.entry_rsi = dict(entry_rsi or {})
+        self.provisional = {}
+        self.fired = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self.actions = []
+        self.last_action = {}
+
+    # Returns [(side, signal row)] for the actions this bar triggers
+    def on_bar(self, symbol, timestamp, close):
+        state = self.states.get(symbol)
+        if state is None:
+            return []
+        day = trading_day(timestamp)
+
+        with self.lock:
+            pending = self.provisional.get(symbol)
+            if pending is not None and pending[0] < day:
+                state.update(*pending)
+            if state.last_date is not None and day <= state.last_date:
+                return []
+            self.provisional[symbol] = (day, float(close))
+
+            latest = pd.DataFrame([state.peek(day, float(close))], index=pd.Index([symbol], name='Ticker'))
+            entry = {symbol: self.entry_rsi[symbol]} if symbol in self.entry_rsi else {}
+            signal = evaluate_signals(latest, entry).iloc[0]
+
+            actions = []
+            if signal['buy'] and symbol not in self.held and (symbol, day, 'buy') not in self.fired:
+                self.fired.add((symbol, day, 'buy'))
+                self.held.add(symbol)
+                self.entry_rsi[symbol] = signal['RSI']
+                actions.append(('buy', signal))
+            elif signal['sell'] and symbol in self.held and (symbol, day, 'sell') not in self.fired:
+                self.fired.add((symbol, day, 'sell'))
+                self.held.discard(symbol)
+                self.entry_rsi.pop(symbol, None)
+                actions.append(('sell', signal))
+            return actions
+
+    async def handle_bar(self, bar):
+        for side, signal in self.on_bar(bar.symbol, bar.timestamp, bar.close):
+            with self.lock:
+                previous = self.last_action.get(bar.symbol)
+                action = self.executor.submit(self._act, side, bar.symbol, signal, previous)
+                self.last_action[bar.symbol] = action
+            self.actions.append(action)
+
+    # A buy callback returning False (e.g. the order never filled) leaves the
+    # symbol unheld again.  `previous` (the symbol's last action) was queued
+    # first, so it is running or done by now.
+    def _act(self, side, symbol, signal, previous=None):
+        if previous is not None:
+            previous.exception()
+        callback = self.on_buy if side == 'buy' else self.on_sell
+        try:
+            done = callback(symbol, signal)
+        except Exception as e:
+            print(f"❌ {side.capitalize()} action for {symbol} failed: {e}")
+            done = False
+        if side == 'buy' and done is False:
+            with self.lock:
+                self.held.discard(symbol)
+                self.entry_rsi.pop(symbol, None)
+        return done
+
+    # Subscribes to `symbols` on `feed` (StockDataStream or ReplayFeed) and
+    # blocks until the feed ends; pending actions are finished first
+    def run(self, feed, symbols):
+        feed.subscribe_bars(self.handle_bar, *symbols)
+        try:
+            feed.run()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+def live_feed():
+    from alpaca.data.live import StockDataStream
+
+    return StockDataStream(os.environ["API_KEY_PAPER"], os.environ["SECRET_KEY_PAPER"])
+
+
+# Replays recorded bars through the same subscribe_bars()/run() interface as
+# alpaca's StockDataStream.  `bars` is a frame with symbol, timestamp and
+# close columns; `speed` > 0 replays with the recorded gaps divided by speed.
+class ReplayFeed:
+    def __init__(self, bars, speed=None):
+        self.bars = bars.sort_values('timestamp', kind='stable')
+        self.speed = speed
+        self.handler = None
+        self.symbols = set()
+
+    @classmethod
+    def from_csv(cls, path, speed=None):
+        bars = pd.read_csv(path)
+        bars['timestamp'] = pd.to_datetime(bars['timestamp'], utc=True)
+        return cls(bars, speed)
+
+    def subscribe_bars(self, handler, *symbols):
+        self.handler = handler
+        self.symbols.update(symbols)
+
+    def run(self):
+        asyncio.run(self._play())
+
+    async def _play(self):
+        previous = None
+        for row in self.bars.itertuples(index=False):
+            if row.symbol not in self.symbols:
+                continue
+            if self.speed and previous is not None:
+                await asyncio.sleep(max(0.0, (row.timestamp - previous).total_seconds()) / self.speed)
+            previous = row.timestamp
+            await self.handler(SimpleNamespace(symbol=row.symbol, timestamp=row.timestamp, close=float(row.close)))
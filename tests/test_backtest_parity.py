@@ -0,0 +1,34 @@
+import numpy as np
+from benchmark import synthetic_bars
+from backtrade import compare_with_backtrader
+from vector_backtest import run_backtest
+
+TICKERS = 12
+YEARS = 3
+
+
+# Synthetic bars where some tickers miss random days, one starts late and one
+# stops early, so the aligned (ticker, date) matrix has gaps
+def parity_bars():
+    bars_by_ticker = synthetic_bars(TICKERS, YEARS, seed=7)
+    rng = np.random.default_rng(7)
+    tickers = list(bars_by_ticker)
+    for ticker in tickers[:4]:
+        bars = bars_by_ticker[ticker]
+        bars_by_ticker[ticker] = bars[rng.random(len(bars)) > 0.1]
+    bars_by_ticker[tickers[4]] = bars_by_ticker[tickers[4]].iloc[300:]
+    bars_by_ticker[tickers[5]] = bars_by_ticker[tickers[5]].iloc[:-200]
+    return bars_by_ticker
+
+
+def test_vectorized_backtest_matches_backtrader():
+    bars_by_ticker = parity_bars()
+
+    trades, open_positions = run_backtest(bars_by_ticker)
+    # Both engines trade, including on the gapped tickers, so the comparison
+    # is not vacuous
+    assert len(trades) > TICKERS
+    assert set(trades['Ticker']) & set(list(bars_by_ticker)[:6])
+    assert open_positions
+
+    assert compare_with_backtrader(bars_by_ticker, workers=1) == []
@@ -0,0 +1,138 @@
+import sys
+import time
+import threading
+import pandas as pd
+from benchmark import synthetic_bars
+from indicators import IndicatorState, update_from_bars
+from stream import ReplayFeed, SignalDaemon
+
+AS_OF = '2025-06-24'
+
+
+def replay_feed(rows):
+    bars = pd.DataFrame(rows, columns=['symbol', 'timestamp', 'close'])
+    bars['timestamp'] = pd.to_datetime(bars['timestamp'], utc=True)
+    return ReplayFeed(bars)
+
+# Minute bars at 9:30-9:3x New York time on `day`
+def session_bars(symbol, day, closes):
+    start = pd.Timestamp(f"{day} 09:30", tz='America/New_York')
+    return [(symbol, start + pd.Timedelta(minutes=i), close) for i, close in enumerate(closes)]
+
+def seeded_states(tickers):
+    bars = synthetic_bars(len(tickers), 1)
+    return {ticker: update_from_bars(IndicatorState(), frame['Close']) for ticker, frame in zip(tickers, bars.values())}
+
+
+def test_daemon_fires_once_per_day_and_commits_the_provisional_bar():
+    states = seeded_states(['DIP', 'HELD', 'FLAT'])
+    last = {ticker: state.prev_close for ticker, state in states.items()}
+    assert {state.last_date for state in states.values()} == {'2024-12-31'}
+
+    # A 40% crash meets the entry rule, a 50% spike the MA20 exit; neither
+    # may fire twice in a day
+    rows = (
+        session_bars('DIP', '2025-01-02', [last['DIP'] * 0.60, last['DIP'] * 0.59, last['DIP'] * 0.58])
+        + session_bars('HELD', '2025-01-02', [last['HELD'] * 1.5, last['HELD'] * 1.6])
+        + session_bars('FLAT', '2025-01-02', [last['FLAT']] * 3)
+        + session_bars('DIP', '2025-01-03', [last['DIP'] * 0.58])
+    )
+
+    lock = threading.Lock()
+    calls = []
+
+    def record(side):
+        def callback(symbol, signal):
+            with lock:
+                calls.append((side, symbol, signal['Date'], signal['Close']))
+            return True
+        return callback
+
+    daemon = SignalDaemon(states, record('buy'), record('sell'), held=['HELD'], entry_rsi={'HELD': 30.0})
+    daemon.run(replay_feed(rows), ['DIP', 'HELD', 'FLAT'])
+
+    assert sorted(calls) == [
+        ('buy', 'DIP', '2025-01-02', last['DIP'] * 0.60),
+        ('sell', 'HELD', '2025-01-02', last['HELD'] * 1.5),
+    ]
+    assert daemon.held == {'DIP'}
+    assert daemon.entry_rsi.keys() == {'DIP'}
+
+    # The first bar of 2025-01-03 folded DIP's last 2025-01-02 price into its
+    # state; the other symbols' days are still provisional
+    assert states['DIP'].last_date == '2025-01-02'
+    assert states['DIP'].prev_close == last['DIP'] * 0.58
+    assert states['HELD'].last_date == '2024-12-31'
+    assert daemon.provisional['HELD'] == ('2025-01-02', last['HELD'] * 1.6)
+
+
+def test_failed_buy_leaves_the_symbol_unheld():
+    states = seeded_states(['DIP'])
+    last = states['DIP'].prev_close
+    daemon = SignalDaemon(states, lambda symbol, signal: False, lambda symbol, signal: None)
+    daemon.run(replay_feed(session_bars('DIP', '2025-01-02', [last * 0.6])), ['DIP'])
+
+    assert ('DIP', '2025-01-02', 'buy') in daemon.fired
+    assert daemon.held == set()
+
+
+def test_sell_waits_for_the_symbols_buy_to_finish():
+    states = seeded_states(['DIP'])
+    last = states['DIP'].prev_close
+    calls = []
+
+    def slow_buy(symbol, signal):
+        time.sleep(0.2)
+        calls.append('buy')
+        return True
+
+    daemon = SignalDaemon(states, slow_buy, lambda symbol, signal: calls.append('sell'))
+    rows = session_bars('DIP', '2025-01-02', [last * 0.6]) + session_bars('DIP', '2025-01-03', [last * 1.5])
+    daemon.run(replay_feed(rows), ['DIP'])
+
+    assert calls == ['buy', 'sell']
+
+
+# bot.run_daemon against the replay fakes: the buy goes to the broker and
+# both trades end up in the positions store and its CSV export
+def test_run_daemon_persists_trades(tmp_path, monkeypatch):
+    import bot
+    import email_sender
+    import positions_store
+    import replay
+    import scheduler
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, '_clients', {})
+    monkeypatch.setitem(sys.modules, 'yfinance', None)
+    monkeypatch.setattr(scheduler, 'scheduler', scheduler.scheduler)
+    monkeypatch.setattr(email_sender._outbox, 'connect', email_sender._outbox.connect)
+    monkeypatch.setattr(email_sender._outbox, 'sleep', email_sender._outbox.sleep)
+    for name in ("UNIVERSE", "API_KEY_PAPER", "SECRET_KEY_PAPER"):
+        monkeypatch.setenv(name, "replay")
+    monkeypatch.setenv("AS_OF_DATE", AS_OF)
+
+    market = replay.Market(replay.synthetic_universe(5, AS_OF), AS_OF)
+    fakes = replay.install(market, tickers=list(market.bars))
+
+    previous = market.window('T0001', end=AS_OF, end_inclusive=False)['Close']
+    positions_store.add_position({
+        'ticker': 'T0001', 'date': previous.index[-1], 'close': previous.iloc[-1],
+        'entry_rsi': 30.0, 'srsi': 10.0, 'ma20': previous.iloc[-1],
+    })
+
+    dip = market.window('T0000', end=AS_OF, end_inclusive=False)['Close'].iloc[-1] * 0.6
+    spike = previous.iloc[-1] * 1.5
+    bot.run_daemon(replay_feed(session_bars('T0000', AS_OF, [dip]) + session_bars('T0001', AS_OF, [spike])))
+
+    assert [(o.symbol, o.side.value, o.type) for o in fakes.trading.submitted if o.type == 'market'] == [('T0000', 'buy', 'market')]
+
+    stored = positions_store.load_positions().set_index('ticker')
+    assert stored.loc['T0000', 'status'] == 'open'
+    assert stored.loc['T0000', 'close'] == dip
+    assert stored.loc['T0001', 'status'] == 'closed'
+    assert stored.loc['T0001', 'sell_price'] == spike
+    assert stored.loc['T0001', 'gain_loss'] == 50.0
+
+    exported = pd.read_csv(tmp_path / positions_store.POSITIONS_CSV).set_index('ticker')
+    assert exported['status'].to_dict() == {'T0000': 'open', 'T0001': 'closed'}
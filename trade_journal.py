@@ -0,0 +1,114 @@
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Buy opportunities from analyze.py as a Parquet dataset partitioned by day:
+# trade_journal/day=YYYY-MM-DD/<run>-0.parquet
+JOURNAL_DIR = os.environ.get("TRADE_JOURNAL_DIR", "trade_journal")
+LEGACY_LOG_FILE = "trade_log.csv"
+
+JOURNAL_SCHEMA = pa.schema([
+    ('Date', pa.timestamp('s')),
+    ('Ticker', pa.string()),
+    ('Price', pa.float64()),
+    ('RSI', pa.float64()),
+    ('SRSI', pa.float64()),
+    ('MA20', pa.float64()),
+    ('MA50', pa.float64()),
+    ('Price_vs_MA20(%)', pa.float64()),
+    ('Price_vs_MA50(%)', pa.float64()),
+    ('PE_Ratio', pa.float64()),
+    ('Recommendation', pa.string()),
+    ('Target1', pa.float64()),
+    ('Target2', pa.float64()),
+    ('StopLoss', pa.float64()),
+])
+JOURNAL_COLUMNS = JOURNAL_SCHEMA.names
+PARTITIONING = ds.partitioning(pa.schema([('day', pa.string())]), flavor='hive')
+
+
+def journal_entry(data):
+    return {
+        **data,
+        'Target1': round(data['MA20'], 2),
+        'Target2': round(data['MA50'], 2),
+        'StopLoss': round(data['Price'] * 0.975, 2)
+    }
+
+
+def _to_table(rows):
+    df = pd.DataFrame(rows, columns=JOURNAL_COLUMNS)
+    df['Date'] = pd.to_datetime(df['Date'])
+    for name in JOURNAL_COLUMNS[2:]:
+        if name != 'Recommendation':
+            df[name] = pd.to_numeric(df[name], errors='coerce')
+    table = pa.Table.from_pandas(df, schema=JOURNAL_SCHEMA, preserve_index=False)
+    days = pa.array(df['Date'].dt.strftime('%Y-%m-%d'), pa.string())
+    return table.append_column('day', days)
+
+def write_rows(rows, directory=JOURNAL_DIR):
+    if not rows:
+        return
+    # A fresh file name per batch, so earlier runs' files are never rewritten
+    ds.write_dataset(
+        _to_table(rows), directory, format='parquet', partitioning=PARTITIONING,
+        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore'
+    )
+
+
+# Collects a run's opportunities and writes them in one batch on flush()
+class TradeJournal:
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        self.rows = []
+
+    def log(self, data):
+        self.rows.append(journal_entry(data))
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        write_rows(rows, self.directory)
+        return len(rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def import_legacy_log(filename=LEGACY_LOG_FILE, directory=JOURNAL_DIR):
+    if not os.path.exists(filename) or os.path.exists(directory):
+        return 0
+    rows = pd.read_csv(filename).to_dict('records')
+    write_rows(rows, directory)
+    print(f"🗂️ Imported {len(rows)} logged opportunities from {filename}")
+    return len(rows)
+
+
+# Logged opportunities as a DataFrame, optionally for some tickers and/or a
+# date range; the day partitions outside the range are not read at all
+def query_opportunities(tickers=None, start=None, end=None, directory=JOURNAL_DIR):
+    if not os.path.exists(directory):
+        return pd.DataFrame(columns=JOURNAL_COLUMNS)
+
+    dataset = ds.dataset(directory, format='parquet', schema=JOURNAL_SCHEMA.append(pa.field('day', pa.string())),
+                         partitioning=PARTITIONING)
+    filters = []
+    if start is not None:
+        filters.append(ds.field('day') >= pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        filters.append(ds.field('day') <= pd.Timestamp(end).strftime('%Y-%m-%d'))
+    if tickers is not None:
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        filters.append(ds.field('Ticker').isin(tickers))
+
+    condition = None
+    for expression in filters:
+        condition = expression if condition is None else condition & expression
+
+    df = dataset.to_table(columns=JOURNAL_COLUMNS, filter=condition).to_pandas()
+    return df.sort_values(['Date', 'Ticker'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,122 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+from bar_store import BAR_STORE_DIR, load_arrays
+from indicators import IndicatorState, can_resume, update_from_bars
+
+DEFAULT_TICKERS = [
+    'AAPL', 'MSFT', 'NVDA', 'AMD', 'GOOGL', 'META',
+    'JPM', 'GS', 'BAC', 'JNJ', 'PFE', 'UNH', 'LLY',
+    'AMZN', 'DIS', 'HD', 'COST', 'DE', 'GE', 'XOM', 'CVX',
+    'DAL', 'EXPE', 'SPY', 'QQQ', 'XLK', 'XLF', 'SHOP', 'NET', 'ZS', 'SCHW', 'PYPL',
+    'MRK', 'BMY', 'ABBV', 'TMO', 'IBB',
+    'TGT', 'WMT', 'ULTA', 'MCD',
+    'NOC', 'RTX', 'LMT', 'FCX',
+    'IWM', 'XLV', 'XLE', 'ARKK',
+    #'SQ'
+]
+
+# The UNIVERSE variable is a comma-separated list of symbol files or names
+# of files in UNIVERSE_DIR (e.g. "sp500,russell3000" -> universes/sp500.txt,
+# ...); "default" (or unset) is DEFAULT_TICKERS
+UNIVERSE_DIR = os.environ.get("UNIVERSE_DIR", "universes")
+
+# Pre-screen: the loosest entry rule in use (analyze's "✅ Buy") and the
+# largest one-day move a ticker is assumed to make before the full check.
+# Callers bring the stored bars and states up to the as-of day first, so
+# the move only covers the day being decided (analyze's live price); a
+# state left behind by a failed download gets the bound widened with the
+# square root of the trading days it is behind.  This is a deliberate
+# approximation: a ticker moving further than that is missed for the day.
+PRESCREEN_RSI_MAX = 35
+PRESCREEN_SRSI_MAX = 40
+PRESCREEN_MAX_MOVE = float(os.environ.get("PRESCREEN_MAX_MOVE", "0.10"))
+# States older than this (calendar days) are not trusted and always pass
+PRESCREEN_MAX_AGE_DAYS = int(os.environ.get("PRESCREEN_MAX_AGE_DAYS", "4"))
+
+
+# One symbol per line (blank lines and # comments skipped), or a CSV with a
+# Symbol/Ticker column as index constituent downloads usually have
+def read_symbol_file(path):
+    if path.endswith('.csv'):
+        df = pd.read_csv(path, dtype=str)
+        columns = {c.lower(): c for c in df.columns}
+        column = columns.get('symbol') or columns.get('ticker') or df.columns[0]
+        symbols = df[column].dropna().tolist()
+    else:
+        with open(path, 'r') as f:
+            symbols = [line.split('#', 1)[0] for line in f]
+        symbols = [s for line in symbols for s in line.replace(',', ' ').split()]
+    return [s.strip().upper() for s in symbols if s.strip()]
+
+def _universe_path(name, directory):
+    if os.path.exists(name):
+        return name
+    for extension in ('.txt', '.csv'):
+        path = os.path.join(directory, name + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"no symbol file for universe '{name}'")
+
+def load_universe(spec=None, directory=UNIVERSE_DIR):
+    spec = spec if spec is not None else os.environ.get("UNIVERSE", "default")
+    tickers = []
+    for name in [part.strip() for part in spec.split(',') if part.strip()]:
+        if name == 'default':
+            tickers.extend(DEFAULT_TICKERS)
+        else:
+            tickers.extend(read_symbol_file(_universe_path(name, directory)))
+    return list(dict.fromkeys(tickers))
+
+
+# Brings each ticker's IndicatorState up to its stored bars before `end`
+# (today's bar may still be forming), reading only bars since the state's
+# last one; no requests are made, tickers without stored bars are skipped
+def advance_states(tickers, states, source, end, store_dir=BAR_STORE_DIR):
+    end = pd.Timestamp(end)
+    for ticker in tickers:
+        state = states.setdefault(ticker, IndicatorState())
+        for start in (state.last_date, None):
+            dates, arrays = load_arrays(ticker, source, start=start, columns=['Close'], store_dir=store_dir)
+            if dates is None:
+                break
+            closes = pd.Series(arrays['Close'], index=pd.DatetimeIndex(dates))
+            closes = closes[closes.index < end].dropna()
+            if can_resume(state, closes):
+                update_from_bars(state, closes)
+                break
+            state.reset()
+    return states
+
+
+# True unless the ticker cannot meet the entry rule: RSI, SRSI and the MA20
+# gap all rise with the next close, so it is enough to check the lowest
+# close within `max_move` of the last one
+def could_enter(state, max_move=PRESCREEN_MAX_MOVE, rsi_max=PRESCREEN_RSI_MAX, srsi_max=PRESCREEN_SRSI_MAX):
+    low = state.prev_close * (1 - max_move)
+    latest = state.peek('9999-12-31', low)
+    if any(math.isnan(latest[col]) for col in ['RSI', 'SRSI', 'MA20']):
+        return True
+    return latest['RSI'] < rsi_max and latest['SRSI'] < srsi_max and low < latest['MA20']
+
+# Stage one of a scan: splits `tickers` into (survivors, dropped) using only
+# the persisted IndicatorStates.  Tickers in `keep` (held positions), and
+# those without a state as of recently before `as_of`, always survive.
+def prescreen(tickers, states, as_of, keep=(), max_move=PRESCREEN_MAX_MOVE, max_age_days=PRESCREEN_MAX_AGE_DAYS):
+    keep = set(keep)
+    as_of = pd.Timestamp(as_of).normalize()
+    oldest = as_of - pd.Timedelta(days=max_age_days)
+    survivors, dropped = [], []
+    for ticker in tickers:
+        state = states.get(ticker)
+        if ticker in keep or state is None or state.last_date is None or pd.Timestamp(state.last_date) < oldest:
+            survivors.append(ticker)
+            continue
+        behind = max(1, int(np.busday_count(pd.Timestamp(state.last_date).date(), as_of.date())))
+        if could_enter(state, min(0.9, max_move * math.sqrt(behind))):
+            survivors.append(ticker)
+        else:
+            dropped.append(ticker)
+    print(f"🔎 Pre-screen kept {len(survivors)} of {len(tickers)} tickers")
+    return survivors, dropped
@@ -0,0 +1,435 @@
+import numpy as np
+import pandas as pd
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from indicators import new_rsi_state, rsi_stream, sma_matrix, _unpack
+
+# Array-based replay of backtrade.RSISRSIStrategy for many tickers at once.
+# Rows are tickers, columns are the union of their trading days (NaN where a
+# ticker has no bar); the strategy's state machine steps every row per day
+# and skips rows without a bar, so each row trades exactly its own bars.
+
+STARTING_CASH = 10000
+FIRST_SIGNAL_BAR = 49  # RSISRSIStrategy.next() starts once MA50 is defined
+# Same defaults as RSISRSIStrategy.params
+DEFAULT_PARAMS = dict(
+    rsi_jump_threshold=42, price_ma20_threshold=12, price_ma50_threshold=10,
+    rsi_entry_threshold=30, srsi_entry_threshold=30, rsi_overbought=70,
+    take_profit_pct=0.20, stop_loss_pct=0.20,
+)
+
+EXIT_REASONS = ["Stop Loss", "Take Profit", "RSI Overbought", "RSI Jump", "Price > MA20", "Price > MA50", "Signal Exit", "Unknown"]
+
+TRADE_COLUMNS = [
+    'Entry Date', 'Exit Date', 'Buy Price', 'Sell Price', 'PnL', 'PnL_%', 'Dollar_PnL',
+    'Stopped Out', 'Profit Taken', 'Exit Reason', 'Win', 'Ticker'
+]
+
+# Bars of history the indicators need from before a chunk: MA50 looks back
+# 49 closes, the stochastic 13 RSI values
+CLOSE_WARMUP = 49
+RSI_WARMUP = 13
+
+
+def align_bars(bars_by_ticker, tickers=None):
+    if tickers is None:
+        tickers = [t for t, bars in bars_by_ticker.items() if bars is not None and not bars.empty]
+    frames = [bars_by_ticker.get(t) for t in tickers]
+    frames = [bars if bars is not None and not bars.empty else None for bars in frames]
+
+    dates = pd.DatetimeIndex([])
+    for bars in frames:
+        if bars is not None:
+            dates = dates.union(bars.index)
+
+    arrays = {col: np.full((len(tickers), len(dates)), np.nan) for col in ['Close', 'High', 'Low']}
+    for row, bars in enumerate(frames):
+        if bars is None:
+            continue
+        positions = dates.get_indexer(bars.index)
+        for col, values in arrays.items():
+            values[row, positions] = bars[col].to_numpy(dtype='float64')
+    return tickers, dates, arrays['Close'], arrays['High'], arrays['Low']
+
+
+# Rolling min/max over the last `window` bars of each row, skipping columns
+# where the row has no bar
+def _rolling_extremes(values, has_bar, window):
+    order = np.argsort(has_bar, axis=1, kind='stable')
+    packed = np.take_along_axis(values, order, axis=1)
+    lowest = np.full_like(packed, np.nan)
+    highest = np.full_like(packed, np.nan)
+    if packed.shape[1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(packed, window, axis=1)
+        lowest[:, window - 1:] = windows.min(axis=-1)
+        highest[:, window - 1:] = windows.max(axis=-1)
+    return _unpack(lowest, order), _unpack(highest, order)
+
+# Last `count` entries of each row where `has_bar` is set, right-aligned
+# and NaN-padded on the left
+def _tail(values, has_bar, count):
+    order = np.argsort(has_bar, axis=1, kind='stable')
+    values = np.where(has_bar, values, np.nan)
+    tail = np.take_along_axis(values, order, axis=1)[:, -count:]
+    if tail.shape[1] < count:
+        tail = np.hstack([np.full((tail.shape[0], count - tail.shape[1]), np.nan), tail])
+    return tail
+
+
+def new_carry(rows):
+    return dict(
+        rsi=new_rsi_state(rows),
+        close_tail=np.full((rows, CLOSE_WARMUP), np.nan),
+        rsi_tail=np.full((rows, RSI_WARMUP), np.nan),
+        bars=np.zeros(rows, dtype='int64'),
+    )
+
+# Same definitions as the backtrader indicators the strategy uses.  `carry`
+# holds the warm-up of the preceding bars (see new_carry), so a history can
+# be processed chunk by chunk; returns the indicators and the next carry.
+def strategy_indicators(close, carry=None):
+    carry = carry or new_carry(close.shape[0])
+    rsi, rsi_state = rsi_stream(close, 14, seed='sma', state=carry['rsi'])
+
+    has_bar = np.hstack([~np.isnan(carry['close_tail']), ~np.isnan(close)])
+    closes = np.hstack([carry['close_tail'], close])
+    rsis = np.hstack([carry['rsi_tail'], rsi])
+    rsi_has_bar = has_bar[:, CLOSE_WARMUP - RSI_WARMUP:]
+
+    lowest, highest = _rolling_extremes(rsis, rsi_has_bar, 14)
+    srsi = (rsis - lowest) / (highest - lowest + 1e-9) * 100
+    indicators = {
+        'RSI': rsi,
+        'SRSI': srsi[:, RSI_WARMUP:],
+        'MA20': sma_matrix(closes, 20)[:, CLOSE_WARMUP:],
+        'MA50': sma_matrix(closes, 50)[:, CLOSE_WARMUP:],
+    }
+    next_carry = dict(
+        rsi=rsi_state,
+        close_tail=_tail(closes, has_bar, CLOSE_WARMUP),
+        rsi_tail=_tail(rsis, rsi_has_bar, RSI_WARMUP),
+        bars=carry['bars'] + (~np.isnan(close)).sum(axis=1),
+    )
+    return indicators, next_carry
+
+
+def _to_date(value):
+    return pd.Timestamp(value).date()
+
+
+# Aligns the bars and computes the indicators once; simulate() can then be
+# run for any number of parameter sets on the result.  With `tickers` every
+# listed ticker gets a row, with or without bars; with `carry` (the 'carry'
+# of the previous chunk's result) the bars continue that chunk's history.
+def prepare(bars_by_ticker, tickers=None, carry=None):
+    tickers, dates, close, high, low = align_bars(bars_by_ticker, tickers)
+    carry = carry or new_carry(len(tickers))
+    indicators, next_carry = strategy_indicators(close, carry)
+    return dict(
+        tickers=tickers, dates=dates, close=close, high=high, low=low,
+        bars_before=carry['bars'], carry=next_carry, **indicators
+    )
+
+
+def new_sim_state(rows, cash=STARTING_CASH, bars_seen=0):
+    nat = np.datetime64('NaT', 'ns')
+    return dict(
+        in_position=np.zeros(rows, dtype=bool),
+        pending_buy=np.zeros(rows, dtype=bool),
+        pending_sell=np.zeros(rows, dtype=bool),
+        broker_cash=np.full(rows, float(cash)),
+        position_price=np.full(rows, np.nan),
+        buy_price=np.full(rows, np.nan),
+        buy_rsi=np.full(rows, np.nan),
+        entry_date=np.full(rows, nat),
+        info_date=np.full(rows, nat),
+        info_price=np.full(rows, np.nan),
+        last_close=np.full(rows, np.nan),
+        bars_seen=np.zeros(rows, dtype='int64') + bars_seen,
+    )
+
+# Steps the strategy over the prepared bars.  Row i of the simulation trades
+# ticker `rows[i]` (default: one row per ticker) with parameter values taken
+# from `params`, where each value is a scalar or an array with one entry per
+# row.  Passing the returned state back in with the next chunk's prepared
+# bars continues the run.  Returns the closed trades as tuples (row, entry
+# date, exit date, buy price, sell price, stopped out, profit taken, reason
+# index) and the final per-row state.
+def simulate(prepared, params=None, rows=None, cash=STARTING_CASH, state=None):
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    if rows is None:
+        rows = np.arange(len(prepared['tickers']))
+    if state is None:
+        state = new_sim_state(len(rows), cash, prepared['bars_before'][rows])
+    s = {k: v.copy() for k, v in state.items()}
+
+    dates = prepared['dates'].to_numpy(dtype='datetime64[ns]')
+    close, high, low = prepared['close'], prepared['high'], prepared['low']
+    rsi, srsi, ma20, ma50 = prepared['RSI'], prepared['SRSI'], prepared['MA20'], prepared['MA50']
+
+    records = []
+    with np.errstate(invalid='ignore'):
+        for t in range(close.shape[1]):
+            c = close[rows, t]
+            active = ~np.isnan(c)
+
+            # Broker: orders from the previous bar fill at that bar's close (set_coc)
+            fill_price = s['last_close']
+            bought = s['pending_buy'] & active & (s['broker_cash'] >= fill_price)
+            sold = s['pending_sell'] & active
+            s['broker_cash'] = s['broker_cash'] - np.where(bought, fill_price, 0) + np.where(sold, fill_price, 0)
+            s['position_price'] = np.where(bought, fill_price, s['position_price'])
+            s['in_position'] = (s['in_position'] | bought) & ~sold
+            s['pending_buy'] &= ~active
+            s['pending_sell'] &= ~active
+            s['last_close'] = np.where(active, c, s['last_close'])
+
+            ready = active & (s['bars_seen'] >= FIRST_SIGNAL_BAR)
+            s['bars_seen'] += active
+            if not ready.any():
+                continue
+
+            rsi_t = rsi[rows, t]
+            ma20_t = ma20[rows, t]
+            ma50_t = ma50[rows, t]
+            in_position = s['in_position']
+
+            flat = ready & ~in_position
+            entry = flat & (rsi_t < p['rsi_entry_threshold']) & (srsi[rows, t] < p['srsi_entry_threshold']) & (c < ma20_t)
+            s['buy_price'] = np.where(entry, c, s['buy_price'])
+            s['buy_rsi'] = np.where(entry, rsi_t, s['buy_rsi'])
+            s['entry_date'] = np.where(entry, dates[t], s['entry_date'])
+            s['info_date'] = np.where(flat, dates[t], s['info_date'])
+            s['info_price'] = np.where(flat, s['buy_price'], s['info_price'])
+            s['pending_buy'] |= entry
+
+            held = ready & in_position
+            if not held.any():
+                continue
+
+            buy_price = s['buy_price']
+            rsi_jump = rsi_t - s['buy_rsi']
+            price_vs_ma20 = (c - ma20_t) / ma20_t * 100
+            price_vs_ma50 = (c - ma50_t) / ma50_t * 100
+            take_profit_price = buy_price * (1 + p['take_profit_pct'])
+            stop_loss_price = buy_price * (1 - p['stop_loss_pct'])
+            take_profit = high[rows, t] >= take_profit_price
+            stop_loss = low[rows, t] <= stop_loss_price
+
+            overbought = rsi_t > p['rsi_overbought']
+            jumped = rsi_jump > p['rsi_jump_threshold']
+            above_ma20 = price_vs_ma20 > p['price_ma20_threshold']
+            above_ma50 = price_vs_ma50 > p['price_ma50_threshold']
+            sell_signal = overbought | jumped | above_ma20 | above_ma50
+
+            exiting = held & (sell_signal | stop_loss | take_profit)
+            if not exiting.any():
+                continue
+
+            reason = np.select(
+                [stop_loss, take_profit, overbought, jumped, above_ma20, above_ma50, sell_signal],
+                np.arange(7), default=7
+            )
+            sell_price = np.where(stop_loss, stop_loss_price, np.where(take_profit, take_profit_price, c))
+            for row in np.nonzero(exiting)[0]:
+                records.append((row, s['entry_date'][row], dates[t], buy_price[row], sell_price[row],
+                                stop_loss[row], take_profit[row], reason[row]))
+            s['pending_sell'] |= exiting
+
+    records.sort(key=lambda r: (r[0], r[2]))
+    return records, s
+
+
+def trades_frame(records, tickers, rows=None):
+    trades = []
+    for row, entry_date, exit_date, bought_at, sold_at, stopped, took, reason in records:
+        pnl = sold_at - bought_at
+        trades.append({
+            'Entry Date': _to_date(entry_date),
+            'Exit Date': _to_date(exit_date),
+            'Buy Price': bought_at,
+            'Sell Price': sold_at,
+            'PnL': pnl,
+            'PnL_%': pnl / bought_at,
+            'Dollar_PnL': pnl,
+            'Stopped Out': bool(stopped),
+            'Profit Taken': bool(took),
+            'Exit Reason': EXIT_REASONS[reason],
+            'Win': pnl > 0,
+            'Ticker': tickers[row if rows is None else rows[row]],
+        })
+    return pd.DataFrame(trades, columns=TRADE_COLUMNS)
+
+def open_positions_list(state, tickers):
+    open_positions = []
+    for row in np.nonzero(state['in_position'])[0]:
+        info_date = state['info_date'][row]
+        open_positions.append({
+            'Ticker': tickers[row],
+            'Size': 1,
+            'Price': state['position_price'][row],
+            'Value': state['position_price'][row],
+            'Buy Date': None if np.isnat(info_date) else _to_date(info_date),
+            'Buy Price': state['info_price'][row],
+        })
+    return open_positions
+
+
+def run_backtest(bars_by_ticker, params=None, cash=STARTING_CASH):
+    prepared = prepare(bars_by_ticker)
+    records, state = simulate(prepared, params, cash=cash)
+    return trades_frame(records, prepared['tickers']), open_positions_list(state, prepared['tickers'])
+
+
+# === Parameter sweep ===
+
+DEFAULT_GRID = dict(
+    rsi_jump_threshold=[30, 42, 50],
+    price_ma20_threshold=[8, 12, 16],
+    price_ma50_threshold=[6, 10, 14],
+    take_profit_pct=[0.10, 0.20, 0.30],
+    stop_loss_pct=[0.10, 0.20, 0.30],
+)
+
+_sweep_prepared = None
+
+def _init_sweep_worker(prepared):
+    global _sweep_prepared
+    _sweep_prepared = prepared
+
+# Scores a chunk of parameter sets in one simulation: every (ticker, set)
+# pair is a row, so the indicators are shared and only the state is per row.
+def _score_combos(combos):
+    prepared = _sweep_prepared
+    n_tickers = len(prepared['tickers'])
+    rows = np.tile(np.arange(n_tickers), len(combos))
+    combo_of_row = np.repeat(np.arange(len(combos)), n_tickers)
+    params = {
+        name: np.repeat([combo[name] for combo in combos], n_tickers)
+        for name in combos[0]
+    }
+    records, _ = simulate(prepared, params, rows=rows)
+
+    exits = [[] for _ in combos]
+    for row, _, exit_date, bought_at, sold_at, *_ in records:
+        exits[combo_of_row[row]].append((exit_date, sold_at - bought_at))
+
+    scores = []
+    for combo, trades in zip(combos, exits):
+        trades.sort(key=lambda trade: trade[0])
+        pnl = np.array([trade[1] for trade in trades])
+        equity = np.cumsum(pnl)
+        drawdown = np.maximum.accumulate(np.r_[0.0, equity])[1:] - equity if len(pnl) else np.zeros(1)
+        scores.append({
+            **combo,
+            'Total PnL': pnl.sum(),
+            'Trades': len(pnl),
+            'Win Rate': (pnl > 0).mean() if len(pnl) else np.nan,
+            'Max Drawdown': drawdown.max(),
+        })
+    return scores
+
+
+# Evaluates every combination of `grid` ({param: [values]}) on the same
+# prepared indicators, chunks of combinations running in parallel, and
+# returns them ranked by total PnL.
+def sweep(bars_by_ticker, grid=None, workers=None, chunk_size=16):
+    return sweep_prepared(prepare(bars_by_ticker), grid, workers, chunk_size)
+
+def sweep_prepared(prepared, grid=None, workers=None, chunk_size=16):
+    grid = grid or DEFAULT_GRID
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        _init_sweep_worker(prepared)
+        scored = [_score_combos(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep_worker, initargs=(prepared,)) as pool:
+            scored = list(pool.map(_score_combos, chunks))
+
+    results = pd.DataFrame([score for chunk in scored for score in chunk])
+    return results.sort_values(['Total PnL', 'Win Rate'], ascending=False, kind='stable').reset_index(drop=True)
+
+
+# === Walk-forward ===
+
+WALK_FORWARD_TRADES_FILE = "walkforward_trades.csv"
+WALK_FORWARD_WINDOWS_FILE = "walkforward_windows.csv"
+
+PREPARED_ARRAYS = ['close', 'high', 'low', 'RSI', 'SRSI', 'MA20', 'MA50']
+
+def _concat_prepared(chunks):
+    chunks = list(chunks)
+    combined = {name: np.hstack([chunk[name] for chunk in chunks]) for name in PREPARED_ARRAYS}
+    dates = chunks[0]['dates']
+    for chunk in chunks[1:]:
+        dates = dates.append(chunk['dates'])
+    return dict(
+        tickers=chunks[0]['tickers'], dates=dates,
+        bars_before=chunks[0]['bars_before'], carry=chunks[-1]['carry'], **combined
+    )
+
+def _append_csv(df, filename):
+    df.to_csv(filename, mode='a', header=not os.path.exists(filename), index=False)
+
+
+# Rolling walk-forward over [start, end).  `load_chunk(tickers, chunk_start,
+# chunk_end)` returns {ticker: bars} for one `test_months` chunk at a time;
+# each chunk is traded with the grid's best parameters on the preceding
+# `train_months` (rounded up to whole chunks) and its trades are appended to
+# `trades_file`.  Only the indicator warm-up, the open positions and the
+# prepared training chunks are kept in memory, never the full history.
+def walk_forward(tickers, load_chunk, start, end, train_months=12, test_months=3, grid=None,
+                 workers=None, cash=STARTING_CASH,
+                 trades_file=WALK_FORWARD_TRADES_FILE, windows_file=WALK_FORWARD_WINDOWS_FILE):
+    grid = grid or DEFAULT_GRID
+    train_chunks = max(1, -(-train_months // test_months))
+    for filename in (trades_file, windows_file):
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    tickers = list(tickers)
+    carry = None
+    state = None
+    training = deque(maxlen=train_chunks)
+    windows = []
+
+    chunk_start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    while chunk_start < end:
+        chunk_end = min(chunk_start + pd.DateOffset(months=test_months), end)
+        prepared = prepare(load_chunk(tickers, chunk_start, chunk_end), tickers=tickers, carry=carry)
+        carry = prepared['carry']
+
+        if len(training) == train_chunks:
+            ranked = sweep_prepared(_concat_prepared(training), grid, workers)
+            best = {name: ranked.at[0, name].item() for name in grid}
+            records, state = simulate(prepared, best, cash=cash, state=state)
+
+            trades = trades_frame(records, tickers)
+            trades['Window Start'] = chunk_start.date()
+            _append_csv(trades, trades_file)
+
+            window = {
+                'Train Start': training[0]['dates'][0].date() if len(training[0]['dates']) else None,
+                'Test Start': chunk_start.date(),
+                'Test End': chunk_end.date(),
+                **best,
+                'Train PnL': ranked.at[0, 'Total PnL'],
+                'Trades': len(trades),
+                'PnL': trades['Dollar_PnL'].sum(),
+            }
+            _append_csv(pd.DataFrame([window]), windows_file)
+            windows.append(window)
+            print(f"🪟 {window['Test Start']} → {window['Test End']}: {window['Trades']} trades, PnL {window['PnL']:.2f}")
+
+        training.append(prepared)
+        chunk_start = chunk_end
+
+    open_positions = open_positions_list(state, tickers) if state is not None else []
+    return pd.DataFrame(windows), open_positions